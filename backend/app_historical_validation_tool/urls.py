@@ -1,6 +1,7 @@
 from django.urls import path
 from .controllers import get_streamflow_alerts, get_plot_data, get_forecast_table
 from .controllers import get_forecast_csv, get_corrected_simulation_csv, get_historical_simulation_csv
+from .controllers import get_validation_metrics
 
 
 urlpatterns = [
@@ -10,4 +11,5 @@ urlpatterns = [
     path('historical-simulation-csv', get_historical_simulation_csv,  name="historical-simulation-csv"),
     path('corrected-simulation-csv', get_corrected_simulation_csv,  name="corrected-simulation-csv"),
     path('forecast-csv', get_forecast_csv,  name="forecast-csv"),
+    path('validation-metrics', get_validation_metrics,  name="validation-metrics"),
 ]
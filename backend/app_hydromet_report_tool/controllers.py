@@ -1,9 +1,11 @@
 import os
 import datetime as dt
 from io import BytesIO, StringIO
-import matplotlib.pyplot as plt
-from .utils import extract_raster_values_to_points
-from .report import report_hydropower_forecast
+from common.lazy import lazy_import
+
+# Raster, plotting and PDF libraries are only loaded when a report is built
+utils = lazy_import("app_hydromet_report_tool.utils")
+report = lazy_import("app_hydromet_report_tool.report")
 from django.http import HttpResponse, JsonResponse
 
 
@@ -15,7 +17,7 @@ def get_hydropower_daily_forecast(request):
         b = tomorrow.strftime("%Y%m%d07h00")
         datestr = f"{a}{b}"
         url = f"/usr/share/geoserver/data_dir/data/wrf-precipitation/{datestr}/{datestr}.geotiff"
-        data = extract_raster_values_to_points(url)
+        data = utils.extract_raster_values_to_points(url)
     except:
         now = dt.datetime.now() - dt.timedelta(days=1)
         tomorrow = now + dt.timedelta(days=2)
@@ -23,7 +25,7 @@ def get_hydropower_daily_forecast(request):
         b = tomorrow.strftime("%Y%m%d07h00")
         datestr = f"{a}{b}"
         url = f"/usr/share/geoserver/data_dir/data/wrf-precipitation/{datestr}/{datestr}.geotiff"
-        data = extract_raster_values_to_points(url)
+        data = utils.extract_raster_values_to_points(url)
 
     response_data = {'forecasts': data}
     return JsonResponse(response_data)
@@ -37,7 +39,7 @@ def get_hydropower_weekly_forecast(request):
         b = tomorrow.strftime("%Y%m%d07h00")
         datestr = f"{a}{b}"
         url = f"/usr/share/geoserver/data_dir/data/wrf-precipitation/{datestr}/{datestr}.geotiff"
-        data = extract_raster_values_to_points(url)
+        data = utils.extract_raster_values_to_points(url)
     except:
         now = dt.datetime.now() - dt.timedelta(days=1)
         tomorrow = now + dt.timedelta(days=7)
@@ -45,7 +47,7 @@ def get_hydropower_weekly_forecast(request):
         b = tomorrow.strftime("%Y%m%d07h00")
         datestr = f"{a}{b}"
         url = f"/usr/share/geoserver/data_dir/data/wrf-precipitation/{datestr}/{datestr}.geotiff"
-        data = extract_raster_values_to_points(url)
+        data = utils.extract_raster_values_to_points(url)
 
     response_data = {'forecasts': data}
     return JsonResponse(response_data)
@@ -56,7 +58,7 @@ def get_hydropower_daily_forecast_report(request):
     img_path = "/path_to_img"
     legend_path = "/path_to_legend"
     data = [1,1,1,1,1,1,1,1]
-    pdf = report_hydropower_forecast(img_path, legend_path, data, "daily")
+    pdf = report.report_hydropower_forecast(img_path, legend_path, data, "daily")
     response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="boletin_hidrometeorologico.pdf"'
     return response
@@ -66,7 +68,7 @@ def get_hydropower_weekly_forecast_report(request):
     img_path = "/path_to_img"
     legend_path = "/path_to_legend"
     data = [1,1,1,1,1,1,1,1]
-    pdf = report_hydropower_forecast(img_path, legend_path, data, "weekly")
+    pdf = report.report_hydropower_forecast(img_path, legend_path, data, "weekly")
     response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = 'attachment; filename="boletin_hidrometeorologico.pdf"'
     return response
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Previous flood alert GeoJSON (read_sql + shapely Point per row + GeoDataFrame
++ JsonResponse) vs. the FeatureCollection built by Postgres and streamed by
+common.geojson, on a synthetic alert day covering a full drainage network
+generated by Postgres itself (no table needed).
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_alert_geojson --reaches 50000
+"""
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import Point
+from django.core.serializers.json import DjangoJSONEncoder
+from common.database import get_connection
+from common.geojson import point_features_sql, stream_feature_collection
+from geoglows.controllers.geoglows import _alert_properties
+
+
+def synthetic_from_clause(reaches):
+    # One alert row per reach of a synthetic drainage network
+    days = ", ".join(
+        f"(ARRAY['', 'R2', 'R5', 'R10'])[1 + (i * {day}) % 4] AS d{day:02d}"
+        for day in range(1, 16))
+    return f"""
+        FROM (
+            SELECT
+                i AS comid,
+                round((-5 + (i % 997) * 0.006)::numeric, 6) AS latitude,
+                round((-81 + (i % 991) * 0.006)::numeric, 6) AS longitude,
+                'River ' || i AS river, 'Province' AS location1, 'Canton' AS location2,
+                '2024-06-01'::timestamp AS datetime, {days}
+            FROM generate_series(1, {reaches}) AS i
+        ) dn
+        JOIN LATERAL (SELECT dn.*) ag ON true
+    """
+
+
+def legacy_geojson(from_clause):
+    days = ", ".join(f"ag.d{day:02d}" for day in range(1, 16))
+    sql = f"""SELECT dn.comid, dn.latitude, dn.longitude, dn.river,
+                     dn.location1, dn.location2, ag.datetime, {days}
+              {from_clause}"""
+    con = get_connection()
+    query = pd.read_sql(sql, con=con)
+    con.close()
+    query['geometry'] = query.apply(lambda row: Point(row['longitude'], row['latitude']), axis=1)
+    gdf = gpd.GeoDataFrame(query, geometry='geometry')
+    return json.dumps(gdf.__geo_interface__, cls=DjangoJSONEncoder)
+
+
+def streamed_geojson(from_clause):
+    sql = point_features_sql(
+        _alert_properties("comid"), from_clause, "dn.longitude", "dn.latitude")
+    return "".join(stream_feature_collection(sql))
+
+
+def measure(func, from_clause, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(from_clause)
+        latencies.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    payload = func(from_clause)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.median(latencies), peak, payload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reaches", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from_clause = synthetic_from_clause(args.reaches)
+    legacy, legacy_peak, legacy_payload = measure(legacy_geojson, from_clause, args.repeat)
+    streamed, streamed_peak, streamed_payload = measure(streamed_geojson, from_clause, args.repeat)
+
+    # Same features, properties and coordinates
+    legacy_features = json.loads(legacy_payload)["features"]
+    streamed_features = json.loads(streamed_payload)["features"]
+    assert len(legacy_features) == len(streamed_features) == args.reaches
+    for old, new in zip(legacy_features, streamed_features):
+        assert old["properties"] == new["properties"]
+        assert np.allclose(old["geometry"]["coordinates"], new["geometry"]["coordinates"])
+
+    print(f"features: {args.reaches}")
+    print(f"geopandas  {legacy:9.1f} ms  peak {legacy_peak / 2**20:7.1f} MiB")
+    print(f"streamed   {streamed:9.1f} ms  peak {streamed_peak / 2**20:7.1f} MiB  x{legacy / streamed:5.1f}")
@@ -0,0 +1,70 @@
+"""
+Load test of one worker: throughput and latency of an endpoint under a
+given number of concurrent clients. Start the same worker twice, sync and
+async, with the response cache disabled so every request hits the views:
+
+    RESPONSE_CACHE_BACKEND=dummy gunicorn -w 1 config.wsgi:application
+    RESPONSE_CACHE_BACKEND=dummy uvicorn --workers 1 config.asgi:application
+
+and run, from the backend folder, against each of them:
+
+    python -m benchmarks.bench_async_load \\
+        --url "http://127.0.0.1:8000/api/geoglows/geoglows-data-plot?comid={comid}&date=2024-06-01&width=800" \\
+        --comids 9007781,9007782,9007783 --requests 300 --concurrency 1,10,50
+
+{comid} in the URL is replaced by the COMIDs of --comids in turn.
+"""
+import time
+import asyncio
+import argparse
+import itertools
+import numpy as np
+import httpx
+
+
+async def run_load(url, comids, requests, concurrency):
+    urls = itertools.cycle([url.format(comid=comid) for comid in comids])
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(next(urls))
+    latencies = []
+    errors = 0
+
+    async def client(session):
+        nonlocal errors
+        while not queue.empty():
+            target = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await session.get(target)
+                await response.aread()
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[client(session) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+    return elapsed, np.array(latencies), errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--comids", type=str, default="")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=str, default="1,10,50")
+    args = parser.parse_args()
+
+    comids = args.comids.split(",") if args.comids else [""]
+    print(f"{'clients':>8s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>7s}")
+    for concurrency in map(int, args.concurrency.split(",")):
+        elapsed, latencies, errors = asyncio.run(
+            run_load(args.url, comids, args.requests, concurrency))
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{concurrency:8d} {args.requests / elapsed:9.1f} "
+              f"{p50:9.1f} {p95:9.1f} {p99:9.1f} {errors:7d}")
@@ -0,0 +1,68 @@
+"""
+Size and serialization time of the /geoglows-data-plot charts with and
+without the width-aware LTTB downsampling. No database is needed: the
+charts are built from a synthetic 40-year daily series.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_chart_payload --width 900
+"""
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from django.core.serializers.json import DjangoJSONEncoder
+from common import downsample
+from geoglows.controllers.geoglows import (
+    get_return_periods, get_climatology, hs_plot, volumen_plot, fd_plot)
+
+
+def synthetic_simulation(years, rng):
+    index = pd.date_range("1980-01-01", periods=int(years * 365.25), freq="D", name="datetime")
+    seasonal = 80 + 60 * np.sin(2 * np.pi * index.dayofyear / 365.25)
+    values = seasonal * rng.lognormal(0, 0.5, len(index))
+    return pd.DataFrame({"value": values}, index=index)
+
+
+def build_charts(sim, rperiods, climatology, width):
+    return {
+        "hs": hs_plot(sim, rperiods, 1, width),
+        "vp": volumen_plot(climatology["volume"], 1, width / 2),
+        "fd": fd_plot(climatology["fdc"], 1, width / 2),
+    }
+
+
+def measure(sim, rperiods, climatology, width, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = json.dumps(build_charts(sim, rperiods, climatology, width), cls=DjangoJSONEncoder)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return len(payload.encode()), np.median(latencies), payload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--width", type=float, default=900)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    sim = synthetic_simulation(args.years, rng)
+    rperiods = get_return_periods(1, sim)
+    climatology = get_climatology(sim)
+
+    # Downsampled charts
+    size, latency, payload = measure(sim, rperiods, climatology, args.width, args.repeat)
+    peak = max(json.loads(payload)["hs"]["data"][0]["y"])
+
+    # Full resolution charts (downsampling disabled)
+    downsample.MIN_POINTS = 10 ** 9
+    full_size, full_latency, _ = measure(sim, rperiods, climatology, args.width, args.repeat)
+
+    print(f"points in series   {len(sim)}")
+    print(f"full resolution    {full_size / 1024:9.1f} KiB  {full_latency:8.1f} ms")
+    print(f"downsampled        {size / 1024:9.1f} KiB  {latency:8.1f} ms")
+    print(f"peak preserved     {np.isclose(peak, sim['value'].max())}")
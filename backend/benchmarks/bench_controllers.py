@@ -0,0 +1,257 @@
+"""
+Latency, allocations and peak memory of every controller of
+geoglows/controllers/geoglows.py, of both validation apps and of the alert
+functions of the taskfiles, against a database built by
+benchmarks.synthetic_dataset. Every case runs in its own process, so the
+peak RSS of one does not hide the others, and reports:
+
+- cold: first call of the process (lazy imports, templates, connections).
+- p50 / p95: following --repeat calls, with the in-process historical and
+  forecast caches emptied before each one (--cached keeps them).
+- alloc: peak of the Python allocations of one call (tracemalloc).
+- rss: peak RSS of the process.
+
+Run from the backend folder:
+
+    python -m benchmarks.synthetic_dataset --init --comids 100 --stations 10
+    python -m benchmarks.bench_controllers --repeat 10 --output results.json
+
+--cases keeps the cases starting with any of the given prefixes, e.g.
+--cases geoglows.all_data_plot,validation. The reach, station and date
+are the first streamflow station and the last forecast of the database,
+unless given with --comid, --code, --level-code and --date.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import functools
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+
+TASKFILES = os.path.join(os.path.dirname(__file__), "..", "..", "taskfiles", "geoglows")
+WIDTH = 1200
+
+
+@functools.lru_cache()
+def load_taskfile(name):
+    # The taskfiles run their main routine (environment, connection, loop
+    # over every reach) at import: only execute what is above its banner
+    path = os.path.abspath(os.path.join(TASKFILES, f"{name}.py"))
+    with open(path) as file:
+        source = file.read()
+    namespace = {"__name__": f"taskfile_{name}", "__file__": path}
+    exec(compile(source[:source.index("MAIN ROUTINE")], path, "exec"), namespace)
+    return namespace
+
+
+def app_view(module, view, **params):
+    def case(ctx):
+        from importlib import import_module
+        from django.test import RequestFactory
+        request = RequestFactory().get("/", {key: value(ctx) for key, value in params.items()})
+        return getattr(import_module(module), view)(request)
+    return case
+
+
+def geoglows_controller(function, *params):
+    def case(ctx):
+        from geoglows.controllers import geoglows
+        return getattr(geoglows, function)(*[param(ctx) for param in params])
+    return case
+
+
+def taskfile_function(taskfile, function, *params):
+    def case(ctx):
+        from common.database import get_connection
+        con = get_connection()
+        try:
+            return load_taskfile(taskfile)[function](*[param(ctx) for param in params], con=con)
+        finally:
+            con.close()
+    return case
+
+
+comid = lambda ctx: ctx["comid"]
+level_comid = lambda ctx: ctx["level_comid"]
+date = lambda ctx: ctx["date"]
+code = lambda ctx: ctx["code"]
+level_code = lambda ctx: ctx["level_code"]
+name = lambda ctx: ctx["name"]
+width = lambda ctx: WIDTH
+comids = lambda ctx: ctx["comids"]
+
+VALIDATION = "app_historical_validation_tool.controllers"
+WATER_LEVEL = "app_national_water_level_forecast.controllers"
+
+CASES = {
+    # geoglows/controllers/geoglows.py
+    "geoglows.historical_simulation_plot": geoglows_controller("historical_simulation_plot", comid),
+    "geoglows.all_data_plot": geoglows_controller("all_data_plot", comid, date, width),
+    "geoglows.probability_table": geoglows_controller("probability_table", comid, date),
+    "geoglows.flood_alerts": geoglows_controller("get_flood_alerts", date),
+    "geoglows.streamflow_alerts": geoglows_controller("get_streamflow_alerts", date),
+    "geoglows.waterlevel_alerts": geoglows_controller("get_waterlevel_alerts", date),
+    "geoglows.flood_alerts_tile": geoglows_controller(
+        "get_flood_alerts_tile", date, lambda ctx: 6, lambda ctx: 18, lambda ctx: 32),
+    "geoglows.historical_data_csv": geoglows_controller("historical_data_csv", comid),
+    "geoglows.forecast_csv": geoglows_controller("forecast_csv", comid, date),
+    "geoglows.forecast_batch": geoglows_controller("forecast_batch", comids, date),
+    # Historical validation tool (streamflow stations)
+    "validation.streamflow_alerts": app_view(VALIDATION, "get_streamflow_alerts", date=date),
+    "validation.plot_data": app_view(
+        VALIDATION, "get_plot_data", comid=comid, code=code, name=name, date=date, width=width),
+    "validation.forecast_table": app_view(
+        VALIDATION, "get_forecast_table", comid=comid, code=code, date=date),
+    "validation.historical_simulation_csv": app_view(
+        VALIDATION, "get_historical_simulation_csv", comid=comid),
+    "validation.corrected_simulation_csv": app_view(
+        VALIDATION, "get_corrected_simulation_csv", comid=comid, code=code),
+    "validation.forecast_csv": app_view(
+        VALIDATION, "get_forecast_csv", comid=comid, code=code, date=date),
+    "validation.validation_metrics": app_view(VALIDATION, "get_validation_metrics"),
+    # National water level forecast (water level stations)
+    "water_level.alerts": app_view(WATER_LEVEL, "get_water_level_alerts", date=date),
+    "water_level.plot_data": app_view(
+        WATER_LEVEL, "get_plot_data",
+        comid=level_comid, code=level_code, name=name, date=date, width=width),
+    "water_level.forecast_table": app_view(
+        WATER_LEVEL, "get_forecast_table", comid=level_comid, code=level_code, date=date),
+    "water_level.historical_simulation_csv": app_view(
+        WATER_LEVEL, "get_historical_simulation_csv", comid=level_comid),
+    "water_level.corrected_simulation_csv": app_view(
+        WATER_LEVEL, "get_corrected_simulation_csv", comid=level_comid, code=level_code),
+    "water_level.forecast_csv": app_view(
+        WATER_LEVEL, "get_forecast_csv", comid=level_comid, code=level_code, date=date),
+    "water_level.validation_metrics": app_view(WATER_LEVEL, "get_validation_metrics"),
+    # Alert scripts (one reach or station)
+    "alerts.ensemble_forecast": taskfile_function(
+        "update_ensemble_forecast", "get_warnings", comid, date),
+    "alerts.streamflow": taskfile_function(
+        "update_corrected_streamflow", "get_warnings", code, comid, date),
+    "alerts.waterlevel": taskfile_function(
+        "update_corrected_streamflow", "get_warnings_waterlevel", level_code, level_comid, date),
+}
+
+
+def consume(result):
+    """Size of a controller result, reading streamed bodies to the end."""
+    if hasattr(result, "streaming_content"):
+        return sum(len(chunk) for chunk in result.streaming_content)
+    if hasattr(result, "content"):
+        return len(result.content)
+    if isinstance(result, (str, bytes)):
+        return len(result)
+    if isinstance(result, dict):
+        return len(json.dumps(result, default=str))
+    if hasattr(result, "to_csv"):
+        return len(result.to_csv())
+    return sum(len(chunk) for chunk in result)
+
+
+def discover(args):
+    from common.database import get_connection
+    con = get_connection()
+    try:
+        first = lambda sql: con.exec_driver_sql(sql).first()
+        station = first("SELECT code, comid, name FROM streamflow_stations ORDER BY code")
+        level = first("SELECT code, comid FROM waterlevel_stations ORDER BY code")
+        latest = first("SELECT max(initialized) FROM ensemble_forecast")[0]
+        batch = con.exec_driver_sql(
+            f"SELECT comid FROM drainage_network ORDER BY comid LIMIT {args.batch}").scalars().all()
+    finally:
+        con.close()
+    return {
+        "comid": args.comid or station.comid,
+        "code": args.code or station.code,
+        "name": station.name,
+        "level_code": args.level_code or level.code,
+        "level_comid": args.comid or level.comid,
+        "date": args.date or f"{latest:%Y-%m-%d}",
+        "comids": batch}
+
+
+def run_case(case, ctx, repeat, cached):
+    from common.cache import historical_cache, forecast_cache
+
+    def call():
+        if not cached:
+            historical_cache.invalidate()
+            forecast_cache.invalidate()
+        start = time.perf_counter()
+        size = consume(CASES[case](ctx))
+        return size, (time.perf_counter() - start) * 1000
+
+    size, cold = call()
+    latencies = [call()[1] for _ in range(repeat)]
+    tracemalloc.start()
+    call()
+    _, allocated = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "case": case,
+        "size": size,
+        "cold_ms": cold,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "alloc_mib": allocated / 2**20,
+        "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=str, default="")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cached", action="store_true")
+    parser.add_argument("--comid", type=int)
+    parser.add_argument("--code", type=str)
+    parser.add_argument("--level-code", type=str)
+    parser.add_argument("--date", type=str)
+    parser.add_argument("--batch", type=int, default=100,
+                        help="number of reaches of geoglows.forecast_batch")
+    parser.add_argument("--output", type=str, help="JSON file with the results")
+    parser.add_argument("--case", choices=list(CASES))
+    parser.add_argument("--result", type=str)
+    args = parser.parse_args()
+
+    if args.case:
+        # Child process: run one case and write its figures to --result
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+        import django
+        django.setup()
+        try:
+            result = run_case(args.case, discover(args), args.repeat, args.cached)
+        except Exception as error:
+            result = {"case": args.case, "error": f"{type(error).__name__}: {error}"}
+        with open(args.result, "w") as file:
+            json.dump(result, file)
+    else:
+        prefixes = tuple(filter(None, args.cases.split(",")))
+        cases = [case for case in CASES if not prefixes or case.startswith(prefixes)]
+        forwarded = sys.argv[1:]
+        if args.output:
+            forwarded = [a for a in forwarded if a != args.output and not a.startswith("--output")]
+        results = []
+        print(f"{'case':42s} {'size KiB':>9s} {'cold ms':>9s} {'p50 ms':>9s} "
+              f"{'p95 ms':>9s} {'alloc MiB':>10s} {'rss MiB':>8s}")
+        for case in cases:
+            with tempfile.NamedTemporaryFile(suffix=".json") as output:
+                subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_controllers",
+                     "--case", case, "--result", output.name] + forwarded,
+                    stdout=subprocess.DEVNULL, check=True)
+                result = json.load(output)
+            results.append(result)
+            if "error" in result:
+                print(f"{case:42s} {result['error']}")
+            else:
+                print(f"{case:42s} {result['size'] / 1024:9.1f} {result['cold_ms']:9.1f} "
+                      f"{result['p50_ms']:9.1f} {result['p95_ms']:9.1f} "
+                      f"{result['alloc_mib']:10.1f} {result['rss_mib']:8.1f}")
+        if args.output:
+            with open(args.output, "w") as file:
+                json.dump(results, file, indent=2)
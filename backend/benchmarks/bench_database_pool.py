@@ -0,0 +1,63 @@
+"""
+Per-request latency of a fresh engine per request vs. the shared pool.
+
+Run from the backend folder against a local Postgres loaded with
+taskfiles/geoglows/init_db.sql:
+
+    python -m benchmarks.bench_database_pool --comid 9027193 --requests 200
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from common.database import token, get_connection, get_pool_stats
+
+
+def unpooled_request(sql):
+    # Previous behaviour: new engine + TCP/auth handshake on every request
+    db = create_engine(token)
+    con = db.connect()
+    data = pd.read_sql(sql, con)
+    con.close()
+    return data
+
+
+def pooled_request(sql):
+    con = get_connection()
+    data = pd.read_sql(sql, con)
+    con.close()
+    return data
+
+
+def timeit(func, sql, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func(sql)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def report(label, latencies):
+    print("{0:<10} mean={1:8.2f} ms  p50={2:8.2f} ms  p95={3:8.2f} ms".format(
+        label,
+        latencies.mean(),
+        np.percentile(latencies, 50),
+        np.percentile(latencies, 95)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comid", type=int, default=None)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.comid is None:
+        sql = "SELECT 1 AS value"
+    else:
+        sql = f"SELECT datetime,value FROM historical_simulation where comid={args.comid}"
+
+    report("unpooled", timeit(unpooled_request, sql, args.requests))
+    report("pooled", timeit(pooled_request, sql, args.requests))
+    print(get_pool_stats())
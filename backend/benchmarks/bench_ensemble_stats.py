@@ -0,0 +1,87 @@
+"""
+Ensemble statistics: previous per-quantile pandas implementation vs. the
+single-pass kernel in common.ensemble. No database is needed.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_ensemble_stats --steps 85 --reaches 500
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from common.ensemble import get_ensemble_stats, ensemble_quantiles
+
+
+def legacy_ensemble_quantile(ensemble, quantile, label):
+    quantile_df = ensemble.quantile(quantile, axis=1).to_frame()
+    quantile_df.rename(columns={quantile: label}, inplace=True)
+    return quantile_df
+
+
+def legacy_ensemble_stats(ensemble):
+    # Previous get_ensemble_stats (mutates its input)
+    high_res_df = ensemble['ensemble_52'].to_frame()
+    ensemble.drop(columns=['ensemble_52'], inplace=True)
+    ensemble.dropna(inplace=True)
+    high_res_df.dropna(inplace=True)
+    high_res_df.rename(columns={'ensemble_52': 'high_res'}, inplace=True)
+    return pd.concat([
+        legacy_ensemble_quantile(ensemble, 1.00, 'flow_max'),
+        legacy_ensemble_quantile(ensemble, 0.75, 'flow_75%'),
+        legacy_ensemble_quantile(ensemble, 0.50, 'flow_avg'),
+        legacy_ensemble_quantile(ensemble, 0.25, 'flow_25%'),
+        legacy_ensemble_quantile(ensemble, 0.00, 'flow_min'),
+        high_res_df
+    ], axis=1, sort=True)
+
+
+def synthetic_ensemble(steps, rng):
+    # 15 days of 51 members + high resolution member ending earlier
+    index = pd.date_range("2024-01-01", periods=steps, freq="3h", name="datetime")
+    values = rng.gamma(2.0, 50.0, size=(steps, 52))
+    values[int(steps * 0.7):, :51] = np.nan
+    columns = [f"ensemble_{i:02d}" for i in range(1, 53)]
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def timeit(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.median(latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=85)
+    parser.add_argument("--reaches", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    ensemble = synthetic_ensemble(args.steps, rng)
+
+    # Same output as the previous implementation
+    pd.testing.assert_frame_equal(
+        get_ensemble_stats(ensemble), legacy_ensemble_stats(ensemble.copy()))
+
+    legacy = timeit(lambda: legacy_ensemble_stats(ensemble.copy()), args.repeat)
+    kernel = timeit(lambda: get_ensemble_stats(ensemble), args.repeat)
+    print(f"one reach     legacy={legacy:8.3f} ms  kernel={kernel:8.3f} ms  x{legacy / kernel:5.1f}")
+
+    # Whole network: loop of the legacy function vs. one stacked kernel call
+    stacked = rng.gamma(2.0, 50.0, size=(args.reaches, args.steps, 51))
+    frames = [pd.DataFrame(s) for s in stacked]
+
+    def legacy_network():
+        for frame in frames:
+            frame = frame.copy()
+            frame['ensemble_52'] = 0.0
+            legacy_ensemble_stats(frame)
+
+    legacy = timeit(legacy_network, 3)
+    kernel = timeit(lambda: ensemble_quantiles(stacked), 3)
+    print(f"{args.reaches} reaches   legacy={legacy:8.1f} ms  kernel={kernel:8.1f} ms  x{legacy / kernel:5.1f}")
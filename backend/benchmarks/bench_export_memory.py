@@ -0,0 +1,70 @@
+"""
+Peak RSS and time of the simulation downloads: previous DataFrame + to_csv
+into an HttpResponse vs. the streamed exports of common.export (CSV,
+Parquet and Arrow), on a synthetic series generated by Postgres itself (no
+table needed). Every variant runs in its own process, so the peak RSS of
+one does not hide the others.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_export_memory --years 40 --step "1 hour"
+"""
+import sys
+import time
+import resource
+import argparse
+import subprocess
+import pandas as pd
+from django.conf import settings
+
+VARIANTS = ["legacy", "csv", "parquet", "arrow"]
+
+
+def synthetic_sql(years, step):
+    return f"""
+        SELECT d AS datetime, round((extract(doy FROM d) * 1.5)::numeric, 3) AS value
+        FROM generate_series(
+            '1980-01-01'::timestamp,
+            '1980-01-01'::timestamp + interval '{years} years',
+            interval '{step}') AS d
+    """
+
+
+def run_variant(variant, sql):
+    from django.http import HttpResponse
+    from common.database import get_connection
+    from common.export import stream_query, export_response
+    if variant == "legacy":
+        con = get_connection()
+        data = pd.read_sql(sql, con)
+        con.close()
+        data.index = pd.to_datetime(data['datetime'])
+        data = data.drop(columns=['datetime'])
+        response = HttpResponse(content_type='text/csv')
+        data.to_csv(path_or_buf=response, index=True)
+        return len(response.content)
+    response = export_response(stream_query(sql, variant), variant, "benchmark")
+    return sum(len(chunk) for chunk in response.streaming_content)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--step", type=str, default="1 hour")
+    parser.add_argument("--variant", choices=VARIANTS)
+    args = parser.parse_args()
+
+    if args.variant:
+        # Child process: run one variant and report size, time and peak RSS
+        settings.configure()
+        start = time.perf_counter()
+        size = run_variant(args.variant, synthetic_sql(args.years, args.step))
+        elapsed = (time.perf_counter() - start) * 1000
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{args.variant:8s} {size / 2**20:9.1f} MiB  {elapsed:9.1f} ms  peak RSS {peak:8.1f} MiB")
+    else:
+        for variant in VARIANTS:
+            subprocess.run([
+                sys.executable, "-m", "benchmarks.bench_export_memory",
+                "--years", str(args.years), "--step", args.step,
+                "--variant", variant], check=True)
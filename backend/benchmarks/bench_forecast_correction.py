@@ -0,0 +1,158 @@
+"""
+Bias correction of the ensemble forecast and of the forecast records:
+previous per-member (and per-month) loop of the validation apps vs. the
+matrix correction of common.bias_correction.correct_ensemble, on synthetic
+series with NaN gaps and values outside the simulated range. The outputs
+are checked to be the same before timing. No database is needed.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_forecast_correction --years 44
+"""
+import argparse
+import numpy as np
+import pandas as pd
+from common.bias_correction import QuantileMapping, HISTOGRAM, ECDF, BIAS_CORRECTION_METHOD
+from app_historical_validation_tool.controllers import get_corrected_forecast
+from app_historical_validation_tool.controllers import get_corrected_forecast_records
+from app_historical_validation_tool.utils import correct_forecast
+from benchmarks.bench_quantile_mapping import synthetic_stations
+from benchmarks.bench_ensemble_stats import synthetic_ensemble, timeit
+
+
+def legacy_corrected_forecast(simulated_df, ensemble_df, observed_df, method):
+    # Previous get_corrected_forecast: factors and clipping member by member
+    forecast_month = ensemble_df.index[0].month
+    monthly_simulated = simulated_df[simulated_df.index.month == forecast_month].dropna()
+    min_simulated = monthly_simulated.iloc[:, 0].min()
+    max_simulated = monthly_simulated.iloc[:, 0].max()
+    min_factor_df = ensemble_df.copy()
+    max_factor_df = ensemble_df.copy()
+    forecast_ens_df = ensemble_df.copy()
+    for column in ensemble_df.columns:
+        tmp = ensemble_df[column].dropna().to_frame()
+        min_factor = (tmp[column] >= min_simulated).astype(float)
+        min_factor[tmp[column] < min_simulated] = tmp[column][tmp[column] < min_simulated] / min_simulated
+        max_factor = (tmp[column] <= max_simulated).astype(float)
+        max_factor[tmp[column] > max_simulated] = tmp[column][tmp[column] > max_simulated] / max_simulated
+        tmp[column] = np.clip(tmp[column], min_simulated, max_simulated)
+        forecast_ens_df[column] = tmp[column]
+        min_factor_df[column] = min_factor
+        max_factor_df[column] = max_factor
+    corrected_ensembles = correct_forecast(forecast_ens_df, simulated_df, observed_df, method=method)
+    corrected_ensembles *= min_factor_df
+    corrected_ensembles *= max_factor_df
+    return corrected_ensembles
+
+
+def legacy_corrected_records(records_df, simulated_df, observed_df, method):
+    # Previous get_corrected_forecast_records: one correction per month. It
+    # raised on records with NaN (factors shorter than the month)
+    meses = np.arange(records_df.index[0].month, records_df.index[-1].month + 1, 1)
+    fixed_records = pd.DataFrame()
+    for mes in meses:
+        values = records_df.loc[records_df.index.month == mes]
+        monthly_simulated = simulated_df[simulated_df.index.month == mes].dropna()
+        min_simulated = monthly_simulated.iloc[:, 0].min()
+        max_simulated = monthly_simulated.iloc[:, 0].max()
+        column_records = values.columns[0]
+        tmp = values[column_records].dropna().to_frame()
+        min_factor = np.where(tmp[column_records] >= min_simulated, 1,
+                              tmp[column_records] / min_simulated)
+        max_factor = np.where(tmp[column_records] <= max_simulated, 1,
+                              tmp[column_records] / max_simulated)
+        tmp[column_records] = tmp[column_records].clip(lower=min_simulated, upper=max_simulated)
+        fixed_records_df = values.copy()
+        fixed_records_df[column_records] = tmp[column_records]
+        min_factor_records_df = values.copy()
+        max_factor_records_df = values.copy()
+        min_factor_records_df[column_records] = min_factor
+        max_factor_records_df[column_records] = max_factor
+        corrected_values = correct_forecast(fixed_records_df, simulated_df, observed_df, method=method)
+        corrected_values *= min_factor_records_df
+        corrected_values *= max_factor_records_df
+        fixed_records = pd.concat([fixed_records, corrected_values])
+    fixed_records.sort_index(inplace=True)
+    return fixed_records
+
+
+def out_of_range(frame, simulated, rng):
+    # Values below and above the simulated range of every month, and gaps
+    values = frame.to_numpy(copy=True)
+    peak = float(simulated.max().iloc[0])
+    draw = rng.random(values.shape)
+    values[draw < 0.05] = 0.0
+    values[(draw >= 0.05) & (draw < 0.10)] = 0.01
+    values[draw > 0.95] *= peak
+    values[(draw >= 0.10) & (draw < 0.13)] = np.nan
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns)
+
+
+def synthetic_records(start, days, rng):
+    # Within the year of `start` (the months of the records are a range)
+    end = min(pd.Timestamp(start) + pd.Timedelta(days=days), pd.Timestamp(start).replace(month=12, day=31))
+    index = pd.date_range(start, end, freq="3h", name="datetime")
+    return pd.DataFrame({"value": rng.gamma(2.0, 50.0, size=len(index))}, index=index)
+
+
+def check_equivalence(simulated, observed, rng):
+    # Every month of the year, both methods, with and without a stored model
+    cases = 0
+    for method in (HISTOGRAM, ECDF):
+        model = QuantileMapping.fit(simulated, observed, method)
+        for month in range(1, 13):
+            ensemble = synthetic_ensemble(85, rng)
+            ensemble.index = ensemble.index + (pd.Timestamp(f"2024-{month:02d}-20") - ensemble.index[0])
+            ensemble = out_of_range(ensemble, simulated, rng)
+            expected = legacy_corrected_forecast(simulated, ensemble, observed, method)
+            pd.testing.assert_frame_equal(get_corrected_forecast(None, ensemble, None, model), expected)
+            #
+            # Records over up to three months, first without gaps
+            records = synthetic_records(f"2023-{month:02d}-05", 50, rng)
+            records = out_of_range(records, simulated, rng)
+            complete = records.dropna()
+            pd.testing.assert_frame_equal(
+                get_corrected_forecast_records(complete, None, None, model),
+                legacy_corrected_records(complete, simulated, observed, method))
+            #
+            # Gaps stay NaN, the other values are corrected as without them
+            pd.testing.assert_frame_equal(
+                get_corrected_forecast_records(records, None, None, model),
+                legacy_corrected_records(complete, simulated, observed, method).reindex(records.index))
+            cases += 3
+        #
+        # Model fitted on the fly (default method)
+        if method == BIAS_CORRECTION_METHOD:
+            pd.testing.assert_frame_equal(
+                get_corrected_forecast(simulated, ensemble, observed),
+                legacy_corrected_forecast(simulated, ensemble, observed, None))
+            pd.testing.assert_frame_equal(
+                get_corrected_forecast_records(complete, simulated, observed),
+                legacy_corrected_records(complete, simulated, observed, None))
+            cases += 2
+    return cases
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=44)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    simulated, observed = synthetic_stations(1, args.years)
+    simulated, observed = simulated.iloc[:, :1], observed.iloc[:, :1]
+
+    # Same output as the previous implementation
+    cases = check_equivalence(simulated, observed, rng)
+    print(f"{cases} cases equal to the per-member loop")
+
+    # Both fit the mapping of the forecast months, as without a stored model
+    ensemble = out_of_range(synthetic_ensemble(85, rng), simulated, rng)
+    records = synthetic_records("2024-01-01", 60, rng)
+    legacy = timeit(lambda: legacy_corrected_forecast(simulated, ensemble, observed, None), args.repeat)
+    matrix = timeit(lambda: get_corrected_forecast(simulated, ensemble, observed), args.repeat)
+    print(f"ensemble  per member={legacy:8.2f} ms  matrix={matrix:8.2f} ms  x{legacy / matrix:6.1f}")
+    legacy = timeit(lambda: legacy_corrected_records(records, simulated, observed, None), args.repeat)
+    matrix = timeit(lambda: get_corrected_forecast_records(records, simulated, observed), args.repeat)
+    print(f"records   per month ={legacy:8.2f} ms  matrix={matrix:8.2f} ms  x{legacy / matrix:6.1f}")
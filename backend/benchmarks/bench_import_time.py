@@ -0,0 +1,80 @@
+"""
+Cold start import report: time to import the URL configuration (every app,
+view and controller) in a fresh interpreter, as a worker does when it
+starts, broken down per module with `python -X importtime`.
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_import_time --top 25
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+
+# Cold start budget of a worker (import of config.urls)
+STARTUP_TARGET_MS = 1500
+
+# Project packages, reported module by module
+PROJECT_PACKAGES = (
+    "config", "common", "geoglows", "metdata", "users",
+    "app_historical_validation_tool", "app_national_water_level_forecast",
+    "app_hydromet_report_tool")
+
+STARTUP_CODE = (
+    "import os;"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings');"
+    "import django; django.setup();"
+    "import config.urls")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def cold_start():
+    # Fresh interpreter, so nothing is imported yet
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        capture_output=True, text=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    elapsed = (time.perf_counter() - start) * 1000
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr[-2000:])
+    modules = []
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us) / 1000, int(cumulative_us) / 1000, len(indent)))
+    return elapsed, modules
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [cold_start() for _ in range(args.repeat)]
+    elapsed = sorted(run[0] for run in runs)[len(runs) // 2]
+    modules = runs[-1][1]
+
+    # Self time grouped by top level package (third party libraries)
+    packages = defaultdict(float)
+    for name, self_ms, _, _ in modules:
+        packages[name.split(".")[0]] += self_ms
+    print(f"{'package':40s} {'self ms':>10s}")
+    for name, self_ms in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:40s} {self_ms:10.1f}")
+
+    # Cumulative time of the project modules (what each one pulls in)
+    print(f"\n{'project module':60s} {'cumulative ms':>14s}")
+    for name, _, cumulative_ms, _ in sorted(modules, key=lambda module: -module[2]):
+        if name.split(".")[0] in PROJECT_PACKAGES:
+            print(f"{name:60s} {cumulative_ms:14.1f}")
+
+    status = "OK" if elapsed <= STARTUP_TARGET_MS else "OVER BUDGET"
+    print(f"\ncold start (import config.urls): {elapsed:.0f} ms, "
+          f"target {STARTUP_TARGET_MS} ms -> {status}")
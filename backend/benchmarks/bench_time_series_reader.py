@@ -0,0 +1,64 @@
+"""
+Previous get_format_data (read_sql + strftime round trip) vs. the typed
+reader in common.timeseries, on a synthetic 40-year series generated by
+Postgres itself (no table needed).
+
+Run from the backend folder:
+
+    python -m benchmarks.bench_time_series_reader --years 40 --step "1 day"
+    python -m benchmarks.bench_time_series_reader --years 40 --step "3 hours"
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from common.database import get_connection
+from common.timeseries import read_time_series
+
+
+def legacy_get_format_data(sql_statement, conn):
+    data = pd.read_sql(sql_statement, conn)
+    data.index = pd.to_datetime(data['datetime'])
+    data = data.drop(columns=['datetime'])
+    data.index = pd.to_datetime(data.index)
+    data.index = data.index.to_series().dt.strftime("%Y-%m-%d %H:%M:%S")
+    data.index = pd.to_datetime(data.index)
+    return data
+
+
+def timeit(func, sql, con, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(sql, con)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.median(latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--step", type=str, default="1 day")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    sql = f"""
+        SELECT d AS datetime, round((extract(doy FROM d) * 1.5)::numeric, 3) AS value
+        FROM generate_series(
+            '1980-01-01'::timestamp,
+            '1980-01-01'::timestamp + interval '{args.years} years',
+            interval '{args.step}') AS d
+    """
+    con = get_connection()
+
+    legacy = legacy_get_format_data(sql, con)
+    typed = read_time_series(sql, con)
+    assert (legacy.index == typed.index).all()
+    assert np.allclose(legacy['value'], typed['value'])
+    print(f"rows: {len(typed)}")
+
+    legacy = timeit(legacy_get_format_data, sql, con, args.repeat)
+    typed = timeit(read_time_series, sql, con, args.repeat)
+    print(f"get_format_data   {legacy:9.1f} ms")
+    print(f"read_time_series  {typed:9.1f} ms  x{legacy / typed:5.1f}")
+    con.close()
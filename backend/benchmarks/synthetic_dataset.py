@@ -0,0 +1,241 @@
+"""
+Synthetic GEOGloWS database for the benchmarks: the tables of
+taskfiles/geoglows/init_db.sql filled with reproducible (seeded) data of
+the same shape as the production one:
+
+- drainage_network: --comids river reaches.
+- historical_simulation: daily flows from --start to the day before the
+  first forecast (40+ years by default).
+- ensemble_forecast: --forecast-days initializations of 52 members, 3 hourly
+  up to 6 days and 6 hourly up to 15 days (ensemble_52 hourly up to 10
+  days, as the GEOGloWS API returns them).
+- forecast_records: 3 hourly first day forecasts of the last --records-days.
+- streamflow_stations / waterlevel_stations: --stations each (same codes),
+  on the first reaches, with daily observations since --obs-start (biased,
+  noisy and with gaps) in streamflow_data / waterlevel_data.
+- alert_geoglows, alert_geoglows_streamflow and alert_geoglows_waterlevel:
+  random alert levels for every forecast.
+
+Return periods, corrected simulation, climatology and probabilities tables
+are left empty, so the controllers take their fallbacks; run the update_*
+taskfiles to fill them.
+
+Run from the backend folder, with POSTGRES_* pointing to a disposable
+server (--init runs init_db.sql, which DROPS the geoglows database):
+
+    python -m benchmarks.synthetic_dataset --init --comids 100 --stations 10 \\
+        --date 2024-06-01 --forecast-days 3
+"""
+import io
+import os
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+from common.database import DB_USER, DB_PASS, DB_HOST, DB_PORT, get_engine
+
+INIT_DB_SQL = os.path.join(
+    os.path.dirname(__file__), "..", "..", "taskfiles", "geoglows", "init_db.sql")
+
+MEMBERS = [f"ensemble_{member:02d}" for member in range(1, 53)]
+PROVINCES = ["Pichincha", "Guayas", "Manabi", "Los Rios", "Esmeraldas",
+             "Napo", "Pastaza", "Morona Santiago", "Azuay", "Loja"]
+ALERT_LEVELS = np.array(["R0", "R2", "R5", "R10", "R25", "R50", "R100"])
+ALERT_WEIGHTS = np.array([0.85, 0.06, 0.04, 0.02, 0.015, 0.01, 0.005])
+
+
+def init_database():
+    env = dict(os.environ, PGPASSWORD=DB_PASS or "")
+    subprocess.run([
+        "psql", "-q", "-h", DB_HOST, "-p", str(DB_PORT), "-U", DB_USER,
+        "-d", "postgres", "-f", os.path.abspath(INIT_DB_SQL)], env=env, check=True)
+
+
+def copy_frame(cursor, table, data):
+    # COPY is one order of magnitude faster than to_sql for these volumes
+    buffer = io.StringIO()
+    data.to_csv(buffer, header=False, index=False, float_format="%.3f", na_rep="")
+    buffer.seek(0)
+    columns = ", ".join(data.columns)
+    cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def ensure_partitions(cursor, dates, forecast_dates):
+    # init_db.sql only creates the ensemble_forecast partitions from 2024-06
+    # to 2025-05 and the forecast_records ones of 2024 and 2025
+    for month in sorted(set(pd.DatetimeIndex(forecast_dates).to_period("M"))):
+        start, end = month.start_time, (month + 1).start_time
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS ensemble_forecast_{month.year}_{month.month:02d}
+            PARTITION OF ensemble_forecast
+            FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')""")
+    for year in sorted(set(pd.DatetimeIndex(dates).year)):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS forecast_records_{year}_{year + 1}
+            PARTITION OF forecast_records
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')""")
+
+
+def seasonal_flows(rng, dates, scales):
+    """
+    Daily flows of every reach (day x reach): wet season around April, lag
+    one autocorrelated log noise and a mean flow of about `scales`.
+    """
+    doy = dates.dayofyear.to_numpy()[:, None]
+    season = 1 + 0.6 * np.sin(2 * np.pi * (doy - 15) / 365.25)
+    shocks = rng.normal(0, 0.25, size=(len(dates), len(scales)))
+    noise = np.empty_like(shocks)
+    noise[0] = shocks[0]
+    for day in range(1, len(dates)):
+        noise[day] = 0.85 * noise[day - 1] + shocks[day]
+    return scales * season * np.exp(noise - noise.var(axis=0) / 2)
+
+
+def forecast_times(date):
+    # Members 1-51: 3 hourly up to 144 h, then 6 hourly up to 360 h.
+    # Member 52: hourly up to 240 h.
+    hours = np.union1d(np.arange(0, 241), np.arange(144, 361, 6))
+    low_res = (hours <= 144) & (hours % 3 == 0) | (hours % 6 == 0)
+    return pd.Timestamp(date) + pd.to_timedelta(hours, unit="h"), hours, low_res
+
+
+def ensemble_frame(rng, comid, date, base):
+    times, hours, low_res = forecast_times(date)
+    lead = hours[:, None] / 24
+    # Members spread with the lead time, with an occasional flood pulse
+    spread = rng.normal(0, 0.08, size=(len(hours), 52)) * np.sqrt(1 + lead)
+    drift = rng.normal(0, 0.15, size=52) * lead / 15
+    pulse = rng.uniform(3, 8) if rng.random() < 0.2 else 0
+    peak = rng.uniform(2, 12)
+    shape = 1 + pulse * np.exp(-((lead - peak) / 1.5) ** 2)
+    values = base * shape * np.exp(spread + drift)
+    values[~low_res, :51] = np.nan
+    values[hours > 240, 51] = np.nan
+    data = pd.DataFrame(values, columns=MEMBERS)
+    data.insert(0, "datetime", times.strftime("%Y-%m-%d %H:%M:%S"))
+    data["comid"] = comid
+    data["initialized"] = f"{pd.Timestamp(date):%Y-%m-%d}"
+    return data
+
+
+def alert_frame(rng, key, values, dates):
+    levels = rng.choice(ALERT_LEVELS, p=ALERT_WEIGHTS, size=(len(dates) * len(values), 15))
+    data = pd.DataFrame(levels, columns=[f"d{day:02d}" for day in range(1, 16)])
+    # Overall alert: highest level of the 15 days
+    rank = {level: i for i, level in enumerate(ALERT_LEVELS)}
+    data["alert"] = ALERT_LEVELS[np.vectorize(rank.get)(levels).max(axis=1)]
+    data.insert(0, key, np.tile(values, len(dates)))
+    data.insert(1, "datetime", np.repeat([f"{date:%Y-%m-%d}" for date in dates], len(values)))
+    return data
+
+
+def generate(args):
+    rng = np.random.default_rng(args.seed)
+    forecast_dates = pd.date_range(end=args.date, periods=args.forecast_days, freq="D")
+    end = forecast_dates[0] - pd.Timedelta(days=1)
+    dates = pd.date_range(args.start, end, freq="D")
+    comids = np.arange(args.first_comid, args.first_comid + args.comids)
+    scales = rng.lognormal(3, 1.2, size=len(comids))
+    #
+    raw = get_engine().raw_connection()
+    try:
+        cursor = raw.cursor()
+        records_times = pd.date_range(
+            end - pd.Timedelta(days=args.records_days - 1), args.date, freq="3h")
+        ensure_partitions(cursor, records_times, forecast_dates)
+        #
+        # River reaches
+        copy_frame(cursor, "drainage_network", pd.DataFrame({
+            "comid": comids,
+            "latitude": rng.uniform(-4.5, 1.2, size=len(comids)),
+            "longitude": rng.uniform(-80.8, -75.5, size=len(comids)),
+            "river": [f"Rio {comid}" for comid in comids],
+            "location1": rng.choice(PROVINCES, size=len(comids)),
+            "location2": [f"Canton {comid % 97}" for comid in comids]}))
+        #
+        # Historical simulation, in batches of reaches
+        batch = max(1, 2_000_000 // len(dates))
+        last_flows = np.empty(len(comids))
+        for first in range(0, len(comids), batch):
+            block = slice(first, first + batch)
+            flows = seasonal_flows(rng, dates, scales[block])
+            last_flows[block] = flows[-1]
+            copy_frame(cursor, "historical_simulation", pd.DataFrame({
+                "datetime": np.tile(dates.strftime("%Y-%m-%d"), flows.shape[1]),
+                "comid": np.repeat(comids[block], len(dates)),
+                "value": flows.T.ravel()}))
+            print(f"historical_simulation: {min(first + batch, len(comids))}/{len(comids)} reaches")
+        #
+        # Ensemble forecasts and forecast records
+        for i, comid in enumerate(comids):
+            frames = [ensemble_frame(rng, comid, date, last_flows[i]) for date in forecast_dates]
+            copy_frame(cursor, "ensemble_forecast", pd.concat(frames))
+            copy_frame(cursor, "forecast_records", pd.DataFrame({
+                "datetime": records_times.strftime("%Y-%m-%d %H:%M:%S"),
+                "comid": comid,
+                "value": last_flows[i] * rng.lognormal(0, 0.3, size=len(records_times))}))
+        print(f"ensemble_forecast: {len(forecast_dates)} forecasts of {len(comids)} reaches")
+        #
+        # Stations on the first reaches and their observations (with gaps)
+        stations = comids[:args.stations]
+        obs_dates = dates[dates >= pd.Timestamp(args.obs_start)]
+        cursor.execute(f"""
+            SELECT comid, array_agg(value::float8 ORDER BY datetime)
+            FROM historical_simulation
+            WHERE comid IN ({",".join(map(str, stations))}) AND datetime >= '{obs_dates[0]:%Y-%m-%d}'
+            GROUP BY comid""")
+        simulated = dict(cursor.fetchall())
+        # Same codes for both: alert_geoglows_waterlevel references
+        # streamflow_stations in init_db.sql
+        codes = [f"H{i:04d}" for i in range(1, len(stations) + 1)]
+        for table in ("streamflow", "waterlevel"):
+            copy_frame(cursor, f"{table}_stations", pd.DataFrame({
+                "basin": rng.choice(PROVINCES, size=len(stations)),
+                "code": codes,
+                "name": [f"{table.title()} station {code}" for code in codes],
+                "latitude": rng.uniform(-4.5, 1.2, size=len(stations)),
+                "longitude": rng.uniform(-80.8, -75.5, size=len(stations)),
+                "elevation": rng.uniform(5, 3500, size=len(stations)).round(),
+                "comid": stations,
+                "river": [f"Rio {comid}" for comid in stations],
+                "location1": rng.choice(PROVINCES, size=len(stations)),
+                "location2": [f"Canton {comid % 97}" for comid in stations]}))
+            for code, comid in zip(codes, stations):
+                flows = np.asarray(simulated[comid])
+                values = flows * rng.lognormal(0, 0.3) * rng.lognormal(0, 0.2, size=len(flows))
+                if table == "waterlevel":
+                    values = 0.3 * values ** 0.4
+                kept = rng.random(len(flows)) > 0.15
+                copy_frame(cursor, f"{table}_data", pd.DataFrame({
+                    "datetime": obs_dates[kept].strftime("%Y-%m-%d"),
+                    "code": code,
+                    "value": values[kept]}))
+            copy_frame(cursor, f"alert_geoglows_{table}",
+                       alert_frame(rng, "code", codes, forecast_dates))
+        print(f"stations: {len(stations)} streamflow and {len(stations)} water level")
+        copy_frame(cursor, "alert_geoglows", alert_frame(rng, "comid", comids, forecast_dates))
+        raw.commit()
+        cursor.execute("ANALYZE")
+    finally:
+        raw.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--init", action="store_true",
+                        help="drop and recreate the database with init_db.sql first")
+    parser.add_argument("--comids", type=int, default=100)
+    parser.add_argument("--first-comid", type=int, default=9000001)
+    parser.add_argument("--stations", type=int, default=10)
+    parser.add_argument("--start", type=str, default="1980-01-01")
+    parser.add_argument("--obs-start", type=str, default="1990-01-01")
+    parser.add_argument("--date", type=str, default="2024-06-01",
+                        help="initialization date of the last forecast")
+    parser.add_argument("--forecast-days", type=int, default=3)
+    parser.add_argument("--records-days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.init:
+        init_database()
+    generate(args)
@@ -0,0 +1,169 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import os
+import asyncio
+import functools
+import contextvars
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from common.database import DB_USER, DB_PASS, DB_NAME, DB_PORT, DB_HOST, POOL_SIZE
+from common.lazy import lazy_import
+
+asyncpg = lazy_import("asyncpg")
+httpx = lazy_import("httpx")
+
+
+
+###############################################################################
+#                       ASYNC VIEWS: DATABASE, HTTP, CPU                      #
+###############################################################################
+# Threads of the executor running the CPU bound and blocking parts of the
+# async views (plots, raster reads), per worker process
+ASYNC_EXECUTOR_WORKERS = int(os.getenv('ASYNC_EXECUTOR_WORKERS', 4))
+
+# Timeout (s) of the outbound HTTP calls (GeoServer WFS)
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 30))
+
+executor = ThreadPoolExecutor(
+    max_workers=ASYNC_EXECUTOR_WORKERS, thread_name_prefix="async-views")
+
+_pool = None
+_client = None
+
+
+async def _init_connection(con):
+    # Same conversions as common.timeseries: TIMESTAMP as ISO text (parsed
+    # in bulk by numpy) and NUMERIC as float instead of Decimal
+    await con.set_type_codec(
+        'numeric', schema='pg_catalog', format='text', encoder=str, decoder=float)
+    await con.set_type_codec(
+        'timestamp', schema='pg_catalog', format='text', encoder=str, decoder=str)
+
+
+async def _create_pool():
+    return await asyncpg.create_pool(
+        user=DB_USER,
+        password=DB_PASS,
+        database=DB_NAME,
+        host=DB_HOST,
+        port=DB_PORT,
+        min_size=1,
+        max_size=POOL_SIZE,
+        init=_init_connection)
+
+
+def _loop_bound(resource):
+    # The pool and the HTTP client belong to the event loop that created them
+    return resource is not None and resource[0] is asyncio.get_running_loop()
+
+
+async def get_async_pool():
+    """
+    Return the asyncpg pool of the running event loop, creating it on first
+    use. With an ASGI server every worker process runs one event loop, so
+    there is one pool per process, as with `common.database.get_engine`.
+
+    Returns:
+    --------
+    - asyncpg.Pool
+        Pool of up to POOL_SIZE connections.
+    """
+    global _pool
+    if not _loop_bound(_pool):
+        # Concurrent first requests wait on the same task
+        _pool = (asyncio.get_running_loop(), asyncio.ensure_future(_create_pool()))
+    return await _pool[1]
+
+
+def get_http_client():
+    """
+    Return the httpx.AsyncClient of the running event loop, which keeps the
+    connections to GeoServer open between requests.
+    """
+    global _client
+    if not _loop_bound(_client):
+        _client = (asyncio.get_running_loop(), httpx.AsyncClient(timeout=HTTP_TIMEOUT))
+    return _client[1]
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a CPU bound or blocking function in the bounded executor, so the
+    event loop keeps serving other requests meanwhile.
+
+    Parameters:
+    -----------
+    - func : callable
+        Function to run.
+    - args, kwargs
+        Arguments of `func`.
+
+    Returns:
+    --------
+    - object
+        The value returned by `func`.
+    """
+    loop = asyncio.get_running_loop()
+    # Copy the context, so the spans of common.profiling are still recorded
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, context.run, functools.partial(func, *args, **kwargs))
+
+
+def async_database_errors():
+    """
+    Errors of the asyncpg pool (query, connection and pool timeout), the
+    async counterpart of common.database.DATABASE_ERRORS. A function, since
+    asyncpg is only imported when the async views are used.
+    """
+    return (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError)
+
+
+async def fetch_row(sql_statement):
+    """
+    First row of a query as a dict, None if there is none or the table
+    does not exist yet.
+    """
+    pool = await get_async_pool()
+    try:
+        row = await pool.fetchrow(sql_statement)
+    except asyncpg.UndefinedTableError:
+        return None
+    return None if row is None else dict(row)
+
+
+async def fetch_time_series(sql_statement):
+    """
+    Async counterpart of `common.timeseries.read_time_series`.
+
+    Parameters:
+    -----------
+    - sql_statement : str
+        Query returning a 'datetime' column plus any value columns.
+
+    Returns:
+    --------
+    - pd.DataFrame
+        One column per non 'datetime' column of the query, with a
+        DatetimeIndex named 'datetime'.
+    """
+    pool = await get_async_pool()
+    async with pool.acquire() as con:
+        statement = await con.prepare(sql_statement)
+        attributes = statement.get_attributes()
+        rows = await statement.fetch()
+    #
+    # Transpose the rows and convert every column in one step
+    columns = list(zip(*rows)) if rows else [()] * len(attributes)
+    data = {}
+    for attribute, values in zip(attributes, columns):
+        if attribute.type.name == 'timestamp':
+            data[attribute.name] = np.array(values, dtype='datetime64[ns]')
+        elif attribute.type.name in ('numeric', 'float4', 'float8'):
+            data[attribute.name] = np.array(values, dtype=float)
+        else:
+            data[attribute.name] = list(values)
+    index = pd.DatetimeIndex(data.pop('datetime'), name='datetime')
+    return pd.DataFrame(data, index=index)
@@ -0,0 +1,539 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import os
+import math
+import warnings
+import numpy as np
+import pandas as pd
+import psycopg2
+from sqlalchemy.exc import ProgrammingError
+from common.timeseries import read_time_series
+from common.cache import get_historical_simulation
+
+
+
+###############################################################################
+#                      MONTHLY QUANTILE MAPPING ENGINE                        #
+###############################################################################
+# Empirical CDF of the monthly flows:
+# - histogram: CDF at the edges of a Sturges histogram, the method of
+#   geoglows.bias (results identical to the previous scipy interp1d code).
+# - ecdf: exact empirical CDF (Hazen plotting positions), without binning.
+HISTOGRAM = 'histogram'
+ECDF = 'ecdf'
+METHODS = [HISTOGRAM, ECDF]
+BIAS_CORRECTION_METHOD = os.getenv('BIAS_CORRECTION_METHOD', HISTOGRAM)
+
+# Version of the serialised models (QuantileMapping.to_bytes)
+MODEL_FORMAT = 1
+
+
+def histogram_cdf(values: np.ndarray):
+    """
+    Flow and cumulative probability at the upper edge of each bin of the
+    histogram used by geoglows.bias (Sturges classes, bins starting one
+    width below zero).
+
+    Parameters:
+    -----------
+    - values : np.ndarray
+        Flows of one month, without NaN.
+
+    Returns:
+    --------
+    - tuple(np.ndarray, np.ndarray)
+        Increasing flows and non decreasing probabilities.
+    """
+    max_val = math.ceil(values.max())
+    min_val = math.floor(values.min())
+    if max_val == min_val:
+        warnings.warn('The observational data has the same max and min value. '
+                      'You may get unanticipated results.')
+        max_val += .1
+    number_of_classes = math.ceil(1 + (3.322 * math.log10(values.size)))
+    step_width = (max_val - min_val) / number_of_classes
+    bins = np.arange(-step_width, max_val + 2 * step_width, step_width)
+    counts, bin_edges = np.histogram(values, bins=bins)
+    return bin_edges[1:], np.cumsum(counts.astype(float) / values.size)
+
+
+def empirical_cdf(values: np.ndarray):
+    """
+    Exact empirical CDF of the flows: sorted distinct flows and their Hazen
+    plotting positions, (i + 0.5) / n, tied flows sharing the mean position.
+
+    Parameters:
+    -----------
+    - values : np.ndarray
+        Flows of one month, without NaN.
+
+    Returns:
+    --------
+    - tuple(np.ndarray, np.ndarray)
+        Strictly increasing flows and probabilities.
+    """
+    values = np.sort(values)
+    positions = (np.arange(values.size) + 0.5) / values.size
+    flows, inverse = np.unique(values, return_inverse=True)
+    probabilities = np.bincount(inverse, positions) / np.bincount(inverse)
+    return flows, probabilities
+
+
+def _interp_table(x, xp, fp, extrapolate):
+    # Same arithmetic as scipy.interpolate.interp1d (linear), which used
+    # np.interp inside the table and raised outside it, or with
+    # fill_value='extrapolate' the line through the two nearest points
+    x = np.asarray(x, dtype=float)
+    if not extrapolate:
+        if np.any(x < xp[0]) or np.any(x > xp[-1]):
+            raise ValueError("A value in x_new is outside the interpolation range.")
+        return np.interp(x, xp, fp)
+    hi = np.clip(np.searchsorted(xp, x), 1, len(xp) - 1)
+    lo = hi - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (fp[hi] - fp[lo]) / (xp[hi] - xp[lo])
+        return slope * (x - xp[lo]) + fp[lo]
+
+
+def month_positions(index: pd.DatetimeIndex) -> dict:
+    """
+    Positions of the rows of each calendar month, found with one stable
+    sort of the months instead of one comparison of the index per month.
+
+    Returns:
+    --------
+    - dict
+        {month (1-12): np.ndarray of row positions, in time order}, only
+        for the months present in the index.
+    """
+    months = np.asarray(index.month)
+    order = np.argsort(months, kind='stable')
+    bounds = np.searchsorted(months[order], np.arange(1, 14))
+    return {
+        month: order[bounds[month - 1]:bounds[month]]
+        for month in range(1, 13) if bounds[month] > bounds[month - 1]}
+
+
+class QuantileMapping:
+    """
+    Monthly quantile mapping of one station: for every calendar month, the
+    CDF of the simulated flows (flow to probability) and the CDF of the
+    observed flows (probability to flow), as sorted arrays, plus the range
+    (min, max) of the simulated flows.
+
+        mapping = QuantileMapping.fit(simulated, observed)
+        corrected = mapping.correct(values, month=6)
+    """
+    def __init__(self, simulated: dict, observed: dict, method: str = HISTOGRAM, ranges: dict = None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown quantile mapping method: {method}")
+        self.simulated = simulated
+        self.observed = observed
+        self.method = method
+        self.ranges = ranges or {}
+
+    @classmethod
+    def fit(cls, simulated, observed, method=None, months=None):
+        """
+        Build the monthly CDFs of one station.
+
+        Parameters:
+        -----------
+        - simulated : pd.DataFrame or pd.Series
+            Simulated flows with a DatetimeIndex (first column is used).
+        - observed : pd.DataFrame or pd.Series
+            Observed flows with a DatetimeIndex (first column is used).
+        - method : str, optional
+            HISTOGRAM or ECDF (BIAS_CORRECTION_METHOD by default).
+        - months : list of int, optional
+            Months to fit (every month present in the simulation by default).
+
+        Returns:
+        --------
+        - QuantileMapping
+        """
+        method = method or BIAS_CORRECTION_METHOD
+        cdf = histogram_cdf if method == HISTOGRAM else empirical_cdf
+        tables = []
+        for data in (simulated, observed):
+            series = data.iloc[:, 0] if isinstance(data, pd.DataFrame) else data
+            series = series.dropna()
+            values = series.to_numpy(dtype=float)
+            positions = month_positions(series.index)
+            tables.append({
+                month: values[rows] for month, rows in positions.items()
+                if months is None or month in months})
+        simulated_values, observed_values = tables
+        for month in simulated_values:
+            if month not in observed_values:
+                raise ValueError(f"There are no observations for month {month}.")
+        return cls(
+            {month: cdf(values) for month, values in simulated_values.items()},
+            {month: cdf(values) for month, values in observed_values.items()},
+            method,
+            {month: (values.min(), values.max()) for month, values in simulated_values.items()})
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact serialised form: an int32 header (format, method, number of
+        months and, per month, the month and the sizes of both tables)
+        followed by the float64 tables and ranges, month after month.
+        """
+        months = sorted(self.simulated)
+        header = [MODEL_FORMAT, METHODS.index(self.method), len(months)]
+        tables = []
+        for month in months:
+            simulated_flows, simulated_cdf = self.simulated[month]
+            observed_flows, observed_cdf = self.observed[month]
+            header += [month, simulated_flows.size, observed_flows.size]
+            tables += [simulated_flows, simulated_cdf, observed_flows, observed_cdf,
+                       np.asarray(self.ranges[month], dtype=float)]
+        return (np.asarray(header, dtype='<i4').tobytes()
+                + np.concatenate(tables).astype('<f8').tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """QuantileMapping written by `to_bytes`."""
+        data = memoryview(data)
+        version, method, count = np.frombuffer(data, dtype='<i4', count=3)
+        if version != MODEL_FORMAT:
+            raise ValueError(f"Unknown quantile mapping format: {version}")
+        header = np.frombuffer(data, dtype='<i4', count=3 * count, offset=12).reshape(-1, 3)
+        values = np.frombuffer(data, dtype='<f8', offset=12 + header.nbytes)
+        simulated, observed, ranges = {}, {}, {}
+        position = 0
+        for month, n_simulated, n_observed in header.tolist():
+            sizes = [n_simulated, n_simulated, n_observed, n_observed, 2]
+            parts = np.split(values[position:position + sum(sizes)], np.cumsum(sizes)[:-1])
+            simulated[month] = (parts[0], parts[1])
+            observed[month] = (parts[2], parts[3])
+            ranges[month] = tuple(parts[4].tolist())
+            position += sum(sizes)
+        return cls(simulated, observed, METHODS[method], ranges)
+
+    def to_probability(self, values, month, extrapolate=False):
+        """Non exceedance probability of simulated flows of `month`."""
+        flows, probabilities = self.simulated[month]
+        if self.method == ECDF:
+            return np.interp(values, flows, probabilities)
+        return _interp_table(values, flows, probabilities, extrapolate)
+
+    def to_flow(self, probabilities, month, extrapolate=False):
+        """Observed flows of `month` with the given probabilities."""
+        flows, cdf = self.observed[month]
+        if self.method == ECDF:
+            return np.interp(probabilities, cdf, flows)
+        return _interp_table(probabilities, cdf, flows, extrapolate)
+
+    def correct(self, values, month, extrapolate=False):
+        """
+        Map simulated flows of `month` to the observed distribution. Any
+        shape is accepted; NaN stays NaN. With the histogram method and
+        without `extrapolate`, flows outside the fitted range raise
+        ValueError; the ECDF method clamps them to the observed range.
+        """
+        return self.to_flow(self.to_probability(values, month, extrapolate), month, extrapolate)
+
+    def correct_series(self, simulated):
+        """
+        Corrected flows of a whole simulated series (NaN dropped), each
+        month mapped with its own CDFs.
+
+        Returns:
+        --------
+        - pd.Series
+            Corrected flows with the index of the non NaN simulated flows.
+        """
+        series = simulated.iloc[:, 0] if isinstance(simulated, pd.DataFrame) else simulated
+        series = series.dropna()
+        values = series.to_numpy(dtype=float)
+        corrected = np.empty_like(values)
+        for month, rows in month_positions(series.index).items():
+            corrected[rows] = self.correct(values[rows], month)
+        return pd.Series(corrected, index=series.index)
+
+
+def apply_forecast_mapping(mapping: QuantileMapping, forecast: pd.DataFrame, month: int) -> pd.DataFrame:
+    """
+    Corrected copy of a forecast (any number of columns, e.g. the ensemble
+    members) with the CDFs of `month`, all the columns in one call and
+    extrapolated beyond the fitted range. Values without a mapping (NaN)
+    keep the forecast value, as DataFrame.update did.
+    """
+    values = forecast.to_numpy(dtype=float)
+    mapped = mapping.correct(values, month, extrapolate=True)
+    return pd.DataFrame(
+        np.where(np.isnan(mapped), values, mapped),
+        index=forecast.index, columns=forecast.columns)
+
+
+def correct_ensemble(mapping: QuantileMapping, values: np.ndarray, month: int) -> np.ndarray:
+    """
+    Bias correction of a forecast matrix (time x members) with the mapping
+    of `month`, every member at once:
+
+    - values are clipped to the simulated range of the month and mapped
+      (NaN mappings keep the clipped value, as apply_forecast_mapping),
+    - values below (above) the range are scaled back by value / min
+      (value / max), so the corrected forecast keeps their excess.
+
+    Parameters:
+    -----------
+    - mapping : QuantileMapping
+        Model with the CDFs and ranges of `month`.
+    - values : np.ndarray
+        Forecast flows, any shape; NaN stays NaN.
+    - month : int
+        Month of the forecast.
+
+    Returns:
+    --------
+    - np.ndarray
+        Corrected flows, same shape as `values`.
+    """
+    values = np.asarray(values, dtype=float)
+    min_simulated, max_simulated = mapping.ranges[month]
+    clipped = np.clip(values, min_simulated, max_simulated)
+    mapped = mapping.correct(clipped, month, extrapolate=True)
+    corrected = np.where(np.isnan(mapped), clipped, mapped)
+    #
+    # Min and max factors, in the same order as the previous column loop
+    corrected *= np.where(values < min_simulated, values / min_simulated, 1.0)
+    corrected *= np.where(values > max_simulated, values / max_simulated, 1.0)
+    return corrected
+
+
+def correct_stations(simulated: pd.DataFrame, observed: pd.DataFrame, method=None) -> pd.DataFrame:
+    """
+    Bias correct the simulated series of many stations in one call. The
+    months of each index are grouped once and shared by all the stations
+    with that index.
+
+    Parameters:
+    -----------
+    - simulated : pd.DataFrame
+        Simulated flows, one column per station, with a DatetimeIndex.
+    - observed : pd.DataFrame
+        Observed flows with the same column names as `simulated`.
+    - method : str, optional
+        HISTOGRAM or ECDF (BIAS_CORRECTION_METHOD by default).
+
+    Returns:
+    --------
+    - pd.DataFrame
+        Corrected flows with the index and columns of `simulated` (NaN
+        where the simulation is NaN).
+    """
+    method = method or BIAS_CORRECTION_METHOD
+    cdf = histogram_cdf if method == HISTOGRAM else empirical_cdf
+    simulated_months = month_positions(simulated.index)
+    observed_months = month_positions(observed.index)
+    corrected = np.full(simulated.shape, np.nan)
+    for j, station in enumerate(simulated.columns):
+        sim = simulated[station].to_numpy(dtype=float)
+        obs = observed[station].to_numpy(dtype=float)
+        for month, rows in simulated_months.items():
+            sim_month = sim[rows]
+            valid = ~np.isnan(sim_month)
+            if not valid.any():
+                continue
+            obs_month = obs[observed_months.get(month, [])]
+            obs_month = obs_month[~np.isnan(obs_month)]
+            if obs_month.size == 0:
+                raise ValueError(f"There are no observations of {station} for month {month}.")
+            mapping = QuantileMapping(
+                {month: cdf(sim_month[valid])}, {month: cdf(obs_month)}, method)
+            corrected[rows[valid], j] = mapping.correct(sim_month[valid], month)
+    return pd.DataFrame(corrected, index=simulated.index, columns=simulated.columns)
+
+
+
+###############################################################################
+#                      STORED MODELS PER STATION AND REACH                    #
+###############################################################################
+# Flows below this value are raised to it before fitting, as the validation
+# apps do with the observed and simulated series
+MIN_FLOW = 0.1
+
+
+def station_freshness_sql(code, comid, variable, count=True):
+    """
+    SQL conditions that hold while the observations of a station and the
+    simulation of its reach keep the size and last dates stored in the
+    observed_count, observed_until and simulated_until columns. `code` and
+    `comid` are SQL expressions (literals or columns of an outer query).
+
+    With count=False only the last dates are compared (index lookups, no
+    count(*) of the observations), as the requests do: rows edited or added
+    before the last date are picked up by the nightly jobs.
+    """
+    observed_count = f"""
+          observed_count = (SELECT count(*) FROM {variable}_data WHERE code={code})
+          AND""" if count else ""
+    return f"""{observed_count}
+          observed_until IS NOT DISTINCT FROM (
+              SELECT max(datetime) FROM {variable}_data WHERE code={code})
+          AND simulated_until IS NOT DISTINCT FROM (
+              SELECT max(datetime) FROM historical_simulation WHERE comid={comid})
+    """
+
+
+def _stored_model_sql(code, comid, variable, method, count=True):
+    # The model is only returned while the observations and the simulation
+    # it was fitted on are unchanged
+    fresh = station_freshness_sql(f"'{code}'", comid, variable, count)
+    return f"""
+        SELECT model FROM bias_correction_models
+        WHERE code='{code}' AND comid={comid} AND variable='{variable}' AND method='{method}'
+          AND {fresh}
+    """
+
+
+def series_until(index):
+    """Last date of a series as text (None if empty), as stored with the models."""
+    return None if index.empty else f"{index.max():%Y-%m-%d %H:%M:%S}"
+
+
+def store_bias_model(con, code, comid, variable, mapping, simulated, observed):
+    """
+    Write (or replace) the model of a station, with the size and last date
+    of the series it was fitted on. Nothing is written if the table does
+    not exist yet.
+    """
+    try:
+        con.exec_driver_sql("""
+            INSERT INTO bias_correction_models
+                (code, comid, variable, method, observed_count, observed_until,
+                 simulated_until, model, updated)
+            VALUES (%(code)s, %(comid)s, %(variable)s, %(method)s, %(observed_count)s,
+                    %(observed_until)s, %(simulated_until)s, %(model)s, now())
+            ON CONFLICT (code, comid, variable, method) DO UPDATE SET
+                observed_count = EXCLUDED.observed_count,
+                observed_until = EXCLUDED.observed_until,
+                simulated_until = EXCLUDED.simulated_until,
+                model = EXCLUDED.model,
+                updated = EXCLUDED.updated
+        """, {
+            "code": code,
+            "comid": int(comid),
+            "variable": variable,
+            "method": mapping.method,
+            "observed_count": len(observed),
+            "observed_until": series_until(observed.index),
+            "simulated_until": series_until(simulated.index),
+            "model": mapping.to_bytes()})
+        con.commit()
+    except ProgrammingError:
+        con.rollback()
+
+
+def get_bias_model(con, code, comid, variable='streamflow', simulated=None,
+                   observed=None, method=None, store=False):
+    """
+    Monthly quantile mapping of a station (code) and river reach (comid).
+
+    The models are fitted and stored in bias_correction_models by the
+    nightly job (taskfiles/geoglows/update_corrected_simulation.py) and read
+    back by every correction, so a request only applies a precomputed
+    mapping. When the stored model is missing, or older than the last
+    observation or simulation, the request fits it in memory and writes
+    nothing.
+
+    Parameters:
+    -----------
+    - con : sqlalchemy.engine.Connection
+        Database connection.
+    - code : str
+        Station code.
+    - comid : int
+        The COMID of the river reach.
+    - variable : str
+        'streamflow' or 'waterlevel' (observations in {variable}_data).
+    - simulated : pd.DataFrame, optional
+        Historical simulation already loaded by the caller (with MIN_FLOW
+        applied), read from the database when the model has to be fitted
+        and it is not given.
+    - observed : pd.DataFrame, optional
+        Observations already loaded by the caller, as `simulated`.
+    - method : str, optional
+        HISTOGRAM or ECDF (BIAS_CORRECTION_METHOD by default).
+    - store : bool, optional
+        Compare the number of observations too and store the model fitted
+        again (nightly jobs only).
+
+    Returns:
+    --------
+    - QuantileMapping
+    """
+    method = method or BIAS_CORRECTION_METHOD
+    try:
+        sql = _stored_model_sql(code, comid, variable, method, count=store)
+        row = con.exec_driver_sql(sql).first()
+    except ProgrammingError:
+        # Table not created yet: fit without storing
+        con.rollback()
+        row = None
+    if row is not None:
+        return QuantileMapping.from_bytes(row[0])
+    #
+    # Missing or stale: fit on the current series
+    if observed is None:
+        observed = read_time_series(
+            f"SELECT datetime, value FROM {variable}_data WHERE code='{code}'", con)
+        observed[observed < MIN_FLOW] = MIN_FLOW
+    if simulated is None:
+        simulated = get_historical_simulation(comid, con)
+        simulated[simulated < MIN_FLOW] = MIN_FLOW
+    mapping = QuantileMapping.fit(simulated, observed, method)
+    if store:
+        store_bias_model(con, code, comid, variable, mapping, simulated, observed)
+    return mapping
+
+
+
+###############################################################################
+#                    PRECOMPUTED CORRECTED SIMULATION                         #
+###############################################################################
+def get_stored_corrected_simulation(con, code, variable='streamflow', method=None):
+    """
+    Read the bias-corrected historical simulation of a station written by
+    taskfiles/geoglows/update_corrected_simulation.py.
+
+    The nightly job corrects every station with its HISTOGRAM model, so
+    nothing is returned for any other method.
+
+    Parameters:
+    -----------
+    - con : sqlalchemy.engine.Connection
+        Database connection.
+    - code : str
+        Station code.
+    - variable : str
+        'streamflow' or 'waterlevel' (series in corrected_simulation_{variable}).
+    - method : str, optional
+        HISTOGRAM or ECDF (BIAS_CORRECTION_METHOD by default).
+
+    Returns:
+    --------
+    - pd.DataFrame or None
+        Column 'Corrected Simulated Streamflow' indexed by 'datetime', as
+        QuantileMapping.correct_series returns it, or None if the station
+        was not processed yet (the caller corrects it on the fly).
+    """
+    if (method or BIAS_CORRECTION_METHOD) != HISTOGRAM:
+        return None
+    sql = f"""
+        SELECT datetime, value FROM corrected_simulation_{variable}
+        WHERE code='{code}' ORDER BY datetime
+    """
+    try:
+        data = read_time_series(sql, con)
+    except psycopg2.ProgrammingError:
+        # Table not created yet (raised by the DBAPI cursor of
+        # read_time_series): leave the connection usable for the fallback
+        getattr(con, 'connection', con).rollback()
+        return None
+    if data.empty:
+        return None
+    return data.rename(columns={'value': 'Corrected Simulated Streamflow'})
@@ -0,0 +1,248 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from common.timeseries import read_time_series
+
+
+
+###############################################################################
+#                             CACHE CONFIGURATION                             #
+###############################################################################
+# Memory budget of the historical simulation cache (per worker process)
+HISTORICAL_CACHE_MAX_BYTES = int(os.getenv(
+    'HISTORICAL_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+
+# Storage type of the cached values (float32 halves the memory of float64)
+HISTORICAL_CACHE_DTYPE = np.dtype(os.getenv('HISTORICAL_CACHE_DTYPE', 'float32'))
+
+# File touched by the ingestion scripts when the historical simulation changes
+HISTORICAL_CACHE_STAMP = os.getenv(
+    'HISTORICAL_CACHE_STAMP',
+    '/home/ubuntu/inamhi-geoglows/historical_simulation.stamp')
+
+# Memory budget and stamp file of the forecast bundles (ensemble + records)
+FORECAST_CACHE_MAX_BYTES = int(os.getenv(
+    'FORECAST_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+FORECAST_CACHE_STAMP = os.getenv(
+    'FORECAST_CACHE_STAMP',
+    '/home/ubuntu/inamhi-geoglows/ensemble_forecast.stamp')
+
+
+
+###############################################################################
+#                                  LRU CACHE                                  #
+###############################################################################
+class LRUByteCache:
+    """
+    Thread-safe least-recently-used cache bounded by the size in bytes of the
+    numpy arrays it stores.
+
+    Each entry is a tuple of numpy arrays. Arrays are stored read-only so a
+    caller cannot modify the cached copy by accident.
+
+    Parameters:
+    -----------
+    - max_bytes : int
+        Memory budget. The least recently used entries are evicted when a new
+        entry does not fit. Entries larger than the budget are not stored.
+    - stamp_path : str, optional
+        File whose modification time is checked on every lookup. When it
+        changes the whole cache is dropped, which lets processes outside the
+        web server (the ingestion scripts) invalidate it.
+    """
+
+    def __init__(self, max_bytes, stamp_path=None):
+        self.max_bytes = max_bytes
+        self.stamp_path = stamp_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stamp = self._read_stamp()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _read_stamp(self):
+        if self.stamp_path is None:
+            return None
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_stamp(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._clear()
+
+    def _clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def get(self, key):
+        """Return the cached arrays of `key` or None."""
+        with self._lock:
+            self._check_stamp()
+            arrays = self._entries.get(key)
+            if arrays is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return arrays
+
+    def put(self, key, *arrays):
+        """Store the arrays of `key`, evicting old entries if needed."""
+        size = sum(a.nbytes for a in arrays)
+        if size > self.max_bytes:
+            return
+        for a in arrays:
+            a.flags.writeable = False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= sum(a.nbytes for a in old)
+            while self._entries and self._bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= sum(a.nbytes for a in evicted)
+                self.evictions += 1
+            self._entries[key] = arrays
+            self._bytes += size
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry if `key` is None."""
+        with self._lock:
+            if key is None:
+                self._clear()
+                return
+            arrays = self._entries.pop(key, None)
+            if arrays is not None:
+                self._bytes -= sum(a.nbytes for a in arrays)
+                self.invalidations += 1
+
+    def stats(self):
+        """Counters and memory usage of the cache."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+
+###############################################################################
+#                      HISTORICAL SIMULATION PER COMID                        #
+###############################################################################
+historical_cache = LRUByteCache(
+    HISTORICAL_CACHE_MAX_BYTES, stamp_path=HISTORICAL_CACHE_STAMP)
+
+
+def get_historical_simulation(comid, con):
+    """
+    Retrieve the historical simulation of a river reach, using the in-process
+    cache when possible.
+
+    The series is stored as a datetime64[ns] array and a compact value array
+    (HISTORICAL_CACHE_DTYPE), so repeated plot, table and CSV requests for the
+    same COMID do not query and parse decades of data again.
+
+    Parameters:
+    -----------
+    - comid : int or str
+        The COMID of the river reach.
+    - con : sqlalchemy.engine.Connection
+        Database connection, only used on a cache miss.
+
+    Returns:
+    --------
+    - pd.DataFrame
+        A new DataFrame with a 'datetime' index and a 'value' column. It can be
+        modified freely by the caller.
+    """
+    key = int(comid)
+    arrays = historical_cache.get(key)
+    if arrays is None:
+        arrays = _cache_historical_simulation(key, read_time_series(_historical_sql(key), con))
+    return _historical_frame(arrays)
+
+
+async def get_historical_simulation_async(comid):
+    """
+    Async counterpart of `get_historical_simulation` (same cache), reading
+    with the asyncpg pool of common.aio on a cache miss.
+    """
+    from common.aio import fetch_time_series
+    key = int(comid)
+    arrays = historical_cache.get(key)
+    if arrays is None:
+        arrays = _cache_historical_simulation(key, await fetch_time_series(_historical_sql(key)))
+    return _historical_frame(arrays)
+
+
+def _historical_sql(comid):
+    return f"SELECT datetime,value FROM historical_simulation where comid={comid} ORDER BY datetime"
+
+
+def _cache_historical_simulation(key, data):
+    dates = data.index.to_numpy(dtype='datetime64[ns]')
+    values = data['value'].to_numpy(dtype=HISTORICAL_CACHE_DTYPE)
+    arrays = (dates, values)
+    historical_cache.put(key, *arrays)
+    return arrays
+
+
+def _historical_frame(arrays):
+    dates, values = arrays
+    index = pd.DatetimeIndex(dates.copy(), name='datetime')
+    return pd.DataFrame({'value': values.copy()}, index=index)
+
+
+def invalidate_historical_simulation(comid=None):
+    """
+    Drop the cached historical simulation of one COMID, or of every COMID.
+
+    Processes that do not share memory with the web server (cron ingestion
+    scripts) should call `touch_historical_stamp` instead.
+    """
+    historical_cache.invalidate(None if comid is None else int(comid))
+
+
+def touch_historical_stamp(path=HISTORICAL_CACHE_STAMP):
+    """
+    Mark the historical simulation as changed for every worker process. Each
+    worker drops its cache on the next lookup.
+    """
+    with open(path, 'a'):
+        os.utime(path, None)
+
+
+
+###############################################################################
+#                       FORECAST BUNDLES PER COMID AND DATE                   #
+###############################################################################
+forecast_cache = LRUByteCache(
+    FORECAST_CACHE_MAX_BYTES, stamp_path=FORECAST_CACHE_STAMP)
+
+
+def touch_forecast_stamp(path=FORECAST_CACHE_STAMP):
+    """
+    Mark the forecast data (ensemble, records, alerts and thresholds) as
+    changed for every worker process. Each worker drops its forecast bundles
+    on the next lookup and the HTTP validators of the forecast endpoints
+    change.
+    """
+    with open(path, 'a'):
+        os.utime(path, None)
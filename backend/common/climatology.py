@@ -0,0 +1,171 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import ProgrammingError
+from common.lazy import lazy_import
+
+scipy = lazy_import("scipy")
+
+
+
+###############################################################################
+#                     STORED HISTORICAL SIMULATION SUMMARIES                  #
+###############################################################################
+# Day of year labels (leap year calendar) and month labels, in the order the
+# arrays are stored
+DAY_LABELS = pd.date_range('2000-01-01', '2000-12-31', freq='D').strftime('%m/%d').tolist()
+MONTH_LABELS = [f'{month:02d}' for month in range(1, 13)]
+
+# Exceedance probabilities at which the flow duration curve is stored
+FDC_PROBABILITIES = np.linspace(0, 1, 1001)
+
+CLIMATOLOGY_COLUMNS = [
+    'daily_min', 'daily_p25', 'daily_p50', 'daily_p75', 'daily_max',
+    'monthly_p25', 'monthly_p50', 'monthly_p75',
+    'volume_dates', 'volume_values', 'fdc_flow']
+
+
+def get_stored_climatology(con, comid):
+    """
+    Read the precomputed summaries of the historical simulation of a river
+    reach.
+
+    The summaries are written once per model release by
+    taskfiles/geoglows/update_climatology.py, one row of arrays per COMID,
+    so the daily, monthly, volume and flow duration charts do not need to
+    reduce the full series on every request.
+
+    Parameters:
+    -----------
+    - con : sqlalchemy.engine.Connection
+        Database connection.
+    - comid : int
+        The COMID of the river reach.
+
+    Returns:
+    --------
+    - dict or None
+        The same layout returned by `get_climatology` ('daily', 'monthly',
+        'volume' and 'fdc' DataFrames), or None if the summaries were not
+        computed yet.
+    """
+    columns = ", ".join(CLIMATOLOGY_COLUMNS)
+    sql = f"SELECT {columns} FROM historical_climatology WHERE comid={comid}"
+    try:
+        data = pd.read_sql(sql, con)
+    except ProgrammingError:
+        # Table not created yet: leave the connection usable for the fallback
+        con.rollback()
+        return None
+    if data.empty:
+        return None
+    return climatology_from_row(data.iloc[0])
+
+
+def climatology_from_row(row):
+    """
+    Build the climatology DataFrames from one row of historical_climatology
+    (any mapping of CLIMATOLOGY_COLUMNS to arrays).
+    """
+    # Day of year and monthly percentiles
+    daily = pd.DataFrame({
+        'min': row['daily_min'],
+        'p25': row['daily_p25'],
+        'p50': row['daily_p50'],
+        'p75': row['daily_p75'],
+        'max': row['daily_max']}, index=DAY_LABELS, dtype=float)
+    monthly = pd.DataFrame({
+        'p25': row['monthly_p25'],
+        'p50': row['monthly_p50'],
+        'p75': row['monthly_p75']}, index=MONTH_LABELS, dtype=float)
+    #
+    # Cumulative volume (end of each month) and flow duration curve
+    volume = pd.DataFrame(
+        {'value': np.array(row['volume_values'], dtype=float)},
+        index=pd.DatetimeIndex(pd.to_datetime(row['volume_dates']), name='datetime'))
+    fdc = pd.DataFrame({
+        'probability': FDC_PROBABILITIES,
+        'flow': np.array(row['fdc_flow'], dtype=float)})
+    return {"daily": daily, "monthly": monthly, "volume": volume, "fdc": fdc}
+
+
+
+###############################################################################
+#                  SUMMARIES OF THE HISTORICAL SIMULATION                     #
+###############################################################################
+def get_climatology(sim: pd.DataFrame) -> dict:
+    """
+    Summarise the historical simulation for the climatology charts.
+
+    The same summaries are precomputed for every COMID by
+    taskfiles/geoglows/update_climatology.py (see `climatology_row`) and
+    read with `get_stored_climatology`; the geoglows controllers call this
+    function as the fallback when they are not available.
+
+    Parameters:
+    -----------
+    - sim : pd.DataFrame
+        Historical simulation with a datetime index.
+
+    Returns:
+    --------
+    - dict
+        'daily' (min, p25, p50, p75 and max per '%m/%d'), 'monthly' (p25,
+        p50 and p75 per '%m'), 'volume' (cumulative volume in Hm3) and 'fdc'
+        (exceedance probability and flow of the flow duration curve).
+    """
+    values = sim.iloc[:, 0]
+    #
+    # Day of year and monthly percentiles
+    daily = values.groupby(sim.index.strftime("%m/%d"))
+    daily = pd.DataFrame({
+        'min': daily.min(),
+        'p25': daily.quantile(0.25),
+        'p50': daily.quantile(0.5),
+        'p75': daily.quantile(0.75),
+        'max': daily.max()})
+    monthly = values.groupby(sim.index.strftime("%m"))
+    monthly = pd.DataFrame({
+        'p25': monthly.quantile(0.25),
+        'p50': monthly.quantile(0.5),
+        'p75': monthly.quantile(0.75)})
+    #
+    # Cumulative volume (conversion from m3/s to Hm3)
+    volume = pd.DataFrame({'value': (values.values * 0.0864).cumsum()}, index=sim.index)
+    #
+    # Flow duration curve
+    sorted_flow = np.sort(values.values)
+    ranks = len(sorted_flow) - scipy.stats.rankdata(sorted_flow, method='average')
+    fdc = pd.DataFrame({
+        'probability': ranks / (len(sorted_flow) + 1),
+        'flow': sorted_flow})
+    return {"daily": daily, "monthly": monthly, "volume": volume, "fdc": fdc}
+
+
+def climatology_row(climatology: dict) -> dict:
+    """
+    Compact layout of the summaries returned by `get_climatology`, one list
+    per column of historical_climatology (the inverse of
+    `climatology_from_row`): percentiles on DAY_LABELS and MONTH_LABELS,
+    cumulative volume at the last time step of each month and flow duration
+    curve interpolated at FDC_PROBABILITIES.
+    """
+    daily = climatology['daily'].reindex(DAY_LABELS)
+    monthly = climatology['monthly'].reindex(MONTH_LABELS)
+    row = {f'daily_{column}': daily[column] for column in ['min', 'p25', 'p50', 'p75', 'max']}
+    row.update({f'monthly_{column}': monthly[column] for column in ['p25', 'p50', 'p75']})
+    row = {key: value.astype(float).tolist() for key, value in row.items()}
+    #
+    # Cumulative volume, last value of each month
+    volume = climatology['volume']['value']
+    volume = volume.groupby(volume.index.to_period('M')).tail(1)
+    row['volume_dates'] = volume.index.to_pydatetime().tolist()
+    row['volume_values'] = volume.values.tolist()
+    #
+    # Flow duration curve at fixed exceedance probabilities
+    fdc = climatology['fdc']
+    row['fdc_flow'] = np.interp(
+        FDC_PROBABILITIES, fdc['probability'].values[::-1], fdc['flow'].values[::-1]).tolist()
+    return row
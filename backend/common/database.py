@@ -0,0 +1,138 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import os
+import threading
+import psycopg2
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
+
+
+
+###############################################################################
+#                 ENVIROMENTAL VARIABLES AND CONNECTION TOKEN                 #
+###############################################################################
+# Import enviromental variables
+load_dotenv("/home/ubuntu/inamhi-geoglows/.env")
+DB_USER = os.getenv('POSTGRES_USER')
+DB_PASS = os.getenv('POSTGRES_PASSWORD')
+DB_NAME = os.getenv('POSTGRES_DB')
+DB_PORT = os.getenv('POSTGRES_PORT')
+DB_HOST = os.getenv('POSTGRES_HOST', 'localhost')
+
+# Generate the conection token
+token = "postgresql+psycopg2://{0}:{1}@{2}:{3}/{4}"
+token = token.format(DB_USER, DB_PASS, DB_HOST, DB_PORT, DB_NAME)
+
+# Connection pool configuration (per worker process)
+POOL_SIZE = int(os.getenv('POSTGRES_POOL_SIZE', 5))
+POOL_MAX_OVERFLOW = int(os.getenv('POSTGRES_POOL_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = int(os.getenv('POSTGRES_POOL_TIMEOUT', 30))
+POOL_RECYCLE = int(os.getenv('POSTGRES_POOL_RECYCLE', 1800))
+
+# Errors of the pooled connections (pool timeout included) and of the raw
+# psycopg2 cursors of common.timeseries
+DATABASE_ERRORS = (SQLAlchemyError, psycopg2.Error)
+
+
+
+###############################################################################
+#                              SHARED DB ENGINE                               #
+###############################################################################
+_engine = None
+_engine_pid = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the process-wide SQLAlchemy engine, creating it on first use.
+
+    The engine keeps a pool of open connections to Postgres so every request
+    reuses an already authenticated connection instead of building a new
+    engine and handshake. The engine is rebuilt if the process was forked
+    after it was created (e.g. gunicorn preload), since pooled sockets must
+    not be shared between processes.
+
+    Returns:
+    --------
+    - sqlalchemy.engine.Engine
+        The pooled engine shared by all controllers of this process.
+    """
+    global _engine, _engine_pid
+    pid = os.getpid()
+    if _engine is None or _engine_pid != pid:
+        with _engine_lock:
+            if _engine is None or _engine_pid != pid:
+                if _engine is not None:
+                    # Forked child: drop inherited connections without
+                    # closing the parent's sockets
+                    _engine.dispose(close=False)
+                _engine = create_engine(
+                    token,
+                    pool_size=POOL_SIZE,
+                    max_overflow=POOL_MAX_OVERFLOW,
+                    pool_timeout=POOL_TIMEOUT,
+                    pool_recycle=POOL_RECYCLE,
+                    pool_pre_ping=True)
+                _engine_pid = pid
+    return _engine
+
+
+def get_connection():
+    """
+    Check out a connection from the shared pool.
+
+    Calling ``close()`` on the returned connection gives it back to the pool
+    instead of closing the socket.
+
+    Returns:
+    --------
+    - sqlalchemy.engine.Connection
+        A pooled database connection.
+    """
+    return get_engine().connect()
+
+
+def dispose_engine():
+    """
+    Close every pooled connection and forget the shared engine. The next call
+    to `get_engine` builds a fresh one.
+    """
+    global _engine, _engine_pid
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _engine_pid = None
+
+
+def get_pool_stats():
+    """
+    Report the current state of the connection pool.
+
+    Returns:
+    --------
+    - dict
+        Configured limits and the number of idle, checked out and overflow
+        connections of this process. If the engine was not created yet only
+        the configuration is returned.
+    """
+    stats = {
+        'pid': os.getpid(),
+        'initialized': _engine is not None,
+        'pool_size': POOL_SIZE,
+        'max_overflow': POOL_MAX_OVERFLOW,
+        'timeout': POOL_TIMEOUT,
+        'recycle': POOL_RECYCLE,
+    }
+    if _engine is not None:
+        pool = _engine.pool
+        stats.update({
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'status': pool.status(),
+        })
+    return stats
@@ -0,0 +1,120 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import numpy as np
+import pandas as pd
+
+
+
+###############################################################################
+#                        LARGEST TRIANGLE THREE BUCKETS                       #
+###############################################################################
+# Points sent per horizontal pixel of the chart
+POINTS_PER_PIXEL = 2
+
+# Charts narrower than this (or without width) keep this many points
+MIN_POINTS = 500
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select `n_out` points of a line with the largest-triangle-three-buckets
+    algorithm (Steinarsson, 2013).
+
+    The first and last points are always kept. The remaining points are split
+    in n_out - 2 buckets and, in each bucket, the point forming the largest
+    triangle with the previously selected point and the average of the next
+    bucket is kept. The global maximum and minimum are always added, so
+    flood peaks are never lost.
+
+    Parameters:
+    -----------
+    - x : np.ndarray
+        Numeric x coordinates, sorted.
+    - y : np.ndarray
+        Values of the line.
+    - n_out : int
+        Number of points wanted.
+
+    Returns:
+    --------
+    - np.ndarray
+        Sorted indices of the selected points.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    #
+    # Bucket edges between the first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    #
+    # Keep the extremes of the series
+    return np.union1d(selected, [int(np.argmax(y)), int(np.argmin(y))])
+
+
+def max_points(width) -> int:
+    """Number of points worth sending to a chart `width` pixels wide."""
+    try:
+        return max(int(float(width) * POINTS_PER_PIXEL), MIN_POINTS)
+    except (TypeError, ValueError):
+        return MIN_POINTS
+
+
+def _numeric_x(index) -> np.ndarray:
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8.astype(float)
+    index = pd.Index(index)
+    if pd.api.types.is_numeric_dtype(index):
+        return index.to_numpy(dtype=float)
+    return np.arange(len(index), dtype=float)
+
+
+def downsample_indices(index, values, width, *others) -> np.ndarray:
+    """
+    Indices to keep from a line (and from other lines sharing the same x) so
+    a chart `width` pixels wide looks the same as with the full series.
+
+    Parameters:
+    -----------
+    - index : pd.Index or array-like
+        x values (dates, labels or numbers).
+    - values : array-like
+        y values used to select the points.
+    - width : float or str
+        Width of the chart in pixels (the `width` query parameter).
+    - others : array-like
+        Other lines on the same x. Their selected points are merged, so
+        bands built from several lines (e.g. min-max) keep their shape.
+
+    Returns:
+    --------
+    - np.ndarray
+        Sorted indices of the points to keep.
+    """
+    x = _numeric_x(index)
+    n_out = max_points(width)
+    keep = lttb_indices(x, values, n_out)
+    for other in others:
+        keep = np.union1d(keep, lttb_indices(x, other, n_out))
+    return keep
+
+
+def downsample_series(series: pd.Series, width) -> pd.Series:
+    """Peak preserving LTTB downsampling of a Series for a chart `width` pixels wide."""
+    return series.iloc[downsample_indices(series.index, series.values, width)]
@@ -0,0 +1,176 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import numpy as np
+import pandas as pd
+
+
+
+###############################################################################
+#                          ENSEMBLE STATISTICS KERNEL                         #
+###############################################################################
+ENSEMBLE_QUANTILES = [1.00, 0.75, 0.50, 0.25, 0.00]
+ENSEMBLE_STATS_COLUMNS = ['flow_max', 'flow_75%', 'flow_avg', 'flow_25%', 'flow_min']
+HIGH_RES_MEMBER = 'ensemble_52'
+
+
+def ensemble_quantiles(values: np.ndarray) -> np.ndarray:
+    """
+    Compute max, 75%, median, 25% and min of an ensemble in a single pass.
+
+    The members must be on the last axis, so the same kernel works for one
+    reach (time x member) or for the whole network stacked as
+    (reach x time x member). Any time step with a missing member gets NaN in
+    every statistic, which is the behaviour of dropping incomplete rows
+    before computing the quantiles. Linear interpolation is used, as in
+    DataFrame.quantile.
+
+    Parameters:
+    -----------
+    - values : np.ndarray
+        Ensemble values with the members on the last axis.
+
+    Returns:
+    --------
+    - np.ndarray
+        Array with the shape of `values` where the last axis holds the five
+        statistics, in the order of ENSEMBLE_STATS_COLUMNS.
+    """
+    values = np.asarray(values, dtype=float)
+    stats = np.quantile(values, ENSEMBLE_QUANTILES, axis=-1)
+    return np.moveaxis(stats, 0, -1)
+
+
+def get_ensemble_stats(ensemble: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculate the ensemble statistics of one reach without modifying the
+    input DataFrame.
+
+    The statistics are computed over every member except the high resolution
+    one (ensemble_52), which is returned as the 'high_res' column. Time steps
+    where both the statistics and the high resolution value are missing are
+    dropped.
+
+    Parameters:
+    -----------
+    - ensemble : pd.DataFrame
+        Ensemble forecast with one column per member and a datetime index.
+
+    Returns:
+    --------
+    - pd.DataFrame
+        Columns flow_max, flow_75%, flow_avg, flow_25%, flow_min and high_res.
+    """
+    members = ensemble.columns != HIGH_RES_MEMBER
+    values = ensemble.loc[:, members].to_numpy(dtype=float)
+    high_res = ensemble[HIGH_RES_MEMBER].to_numpy(dtype=float)
+    #
+    # Single pass over the (time x member) array
+    stats = ensemble_quantiles(values)
+    stats_df = pd.DataFrame(stats, index=ensemble.index, columns=ENSEMBLE_STATS_COLUMNS)
+    stats_df['high_res'] = high_res
+    #
+    # Keep the time steps with complete statistics or a high resolution value
+    valid = ~np.isnan(stats[:, 0]) | ~np.isnan(high_res)
+    return stats_df[valid].sort_index()
+
+
+
+###############################################################################
+#                        EXCEEDANCE PROBABILITY ENGINE                        #
+###############################################################################
+ALERT_RETURN_PERIODS = [2, 5, 10, 25, 50, 100]
+ALERT_RETURN_PERIOD_COLUMNS = [f'return_period_{rp}' for rp in ALERT_RETURN_PERIODS]
+
+# Alert levels written by the ingestion scripts, from lowest to highest
+ALERT_LEVELS = ['R0'] + [f'R{rp}' for rp in ALERT_RETURN_PERIODS]
+
+
+def daily_window_max(ensemble: pd.DataFrame, startdate, enddate):
+    """
+    Maximum of every member over consecutive one-day windows.
+
+    Window i goes from startdate + i days to startdate + (i + 1) days, both
+    ends included, which is how the probabilities table slices the ensemble
+    with `.loc`. A time step that falls exactly on a boundary counts for the
+    two windows it closes and opens. Windows without data get -inf.
+
+    Parameters:
+    -----------
+    - ensemble : pd.DataFrame
+        Ensemble forecast (time x member) with a datetime index.
+    - startdate : pd.Timestamp
+        Start of the first window.
+    - enddate : pd.Timestamp
+        Last forecast time; the number of windows is the number of whole days
+        between startdate and enddate.
+
+    Returns:
+    --------
+    - tuple(pd.DatetimeIndex, np.ndarray)
+        Start of each window and the (day x member) maximums.
+    """
+    startdate = pd.Timestamp(startdate)
+    days = (pd.Timestamp(enddate) - startdate).days
+    values = ensemble.to_numpy(dtype=float)
+    daily_max = np.full((days, values.shape[1]), -np.inf)
+    #
+    # Whole days elapsed since startdate for every time step
+    one_day = np.timedelta64(1, 'D').astype('timedelta64[ns]').astype(np.int64)
+    elapsed = pd.DatetimeIndex(ensemble.index) - startdate
+    elapsed = elapsed.to_numpy(dtype='timedelta64[ns]').astype(np.int64)
+    day = elapsed // one_day
+    boundary = (elapsed % one_day) == 0
+    #
+    # Each time step goes to its own window and, on a boundary, to the previous one
+    current = (day >= 0) & (day < days)
+    previous = boundary & (day >= 1) & (day <= days)
+    np.maximum.at(daily_max, day[current], values[current])
+    np.maximum.at(daily_max, day[previous] - 1, values[previous])
+    return pd.date_range(startdate, periods=days, freq='D'), daily_max
+
+
+def exceedance_probabilities(daily_max: np.ndarray, thresholds, members: int = 52) -> np.ndarray:
+    """
+    Percentage of ensemble members above each return period threshold.
+
+    Parameters:
+    -----------
+    - daily_max : np.ndarray
+        Daily maximum of every member (day x member).
+    - thresholds : array-like
+        Return period thresholds, ordered as ALERT_RETURN_PERIODS.
+    - members : int
+        Size of the full ensemble, used as denominator.
+
+    Returns:
+    --------
+    - np.ndarray
+        (day x threshold) matrix of percentages (0 - 100).
+    """
+    thresholds = np.asarray(thresholds, dtype=float).ravel()
+    exceeded = daily_max[:, :, None] > thresholds[None, None, :]
+    return exceeded.sum(axis=1) * 100 / members
+
+
+def get_alert_levels(probabilities: np.ndarray, cond: float = 20) -> np.ndarray:
+    """
+    Highest return period whose exceedance probability reaches `cond` on
+    each day ('R0' when none does), as written to the alert tables by the
+    ingestion scripts.
+
+    Parameters:
+    -----------
+    - probabilities : np.ndarray
+        (day x threshold) matrix returned by `exceedance_probabilities`.
+    - cond : float
+        Percentage of members triggering a warning.
+
+    Returns:
+    --------
+    - np.ndarray
+        Alert level of each day, one of ALERT_LEVELS.
+    """
+    reached = np.asarray(probabilities) >= cond
+    last = reached.shape[1] - np.argmax(reached[:, ::-1], axis=1)
+    return np.array(ALERT_LEVELS)[np.where(reached.any(axis=1), last, 0)]
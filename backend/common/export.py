@@ -0,0 +1,210 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import io
+import csv
+import uuid
+import numpy as np
+import psycopg2.extensions
+from django.http import StreamingHttpResponse, HttpResponseBadRequest
+from common.database import get_connection
+from common.timeseries import TIMESTAMP_OID, NUMERIC_OIDS
+from common.timeseries import _TIMESTAMP_AS_TEXT, _NUMERIC_AS_FLOAT
+
+
+
+###############################################################################
+#                          STREAMING DATA EXPORTS                             #
+###############################################################################
+# Rows fetched from the server side cursor (and written) per chunk
+EXPORT_CHUNK_ROWS = 50000
+
+# Supported formats: content type and file extension
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file collecting what pyarrow writes between two chunks. The
+    # position keeps growing after every drain, so the parquet footer offsets
+    # stay right
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _query_chunks(sql_statement, chunk_rows):
+    # (description, rows) per chunk of a server side (named) cursor, with the
+    # same typecasters as read_time_series. At least one chunk is produced,
+    # so empty results still get a header/schema
+    con = get_connection()
+    try:
+        dbapi_connection = getattr(con, 'connection', con)
+        cursor = dbapi_connection.cursor(name=f"export_{uuid.uuid4().hex}")
+        psycopg2.extensions.register_type(_TIMESTAMP_AS_TEXT, cursor)
+        psycopg2.extensions.register_type(_NUMERIC_AS_FLOAT, cursor)
+        cursor.itersize = chunk_rows
+        cursor.execute(sql_statement)
+        rows = cursor.fetchmany(chunk_rows)
+        yield cursor.description, rows
+        while len(rows) == chunk_rows:
+            rows = cursor.fetchmany(chunk_rows)
+            if rows:
+                yield cursor.description, rows
+        cursor.close()
+    finally:
+        con.close()
+
+
+def _record_batch(description, rows):
+    import pyarrow as pa
+    columns = list(zip(*rows)) if rows else [()] * len(description)
+    arrays = []
+    for column, values in zip(description, columns):
+        if column.type_code == TIMESTAMP_OID:
+            arrays.append(pa.array(np.array(values, dtype='datetime64[ns]')))
+        elif column.type_code in NUMERIC_OIDS:
+            arrays.append(pa.array(np.array(values, dtype=float)))
+        else:
+            arrays.append(pa.array(list(values), type=pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=[column.name for column in description])
+
+
+def _write_batches(batches, fmt):
+    # Parquet (one row group per batch) or Arrow IPC stream, sent batch by batch
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    sink = _ChunkSink()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            if fmt == 'parquet':
+                writer = pq.ParquetWriter(sink, batch.schema)
+            else:
+                writer = pa.ipc.new_stream(sink, batch.schema)
+        if fmt == 'parquet':
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_query(sql_statement, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Stream the result of a query as CSV, Parquet or Arrow.
+
+    Rows are read from a server side cursor `chunk_rows` at a time and each
+    chunk is written out before the next one is fetched, so the export never
+    holds the full result (as rows, DataFrame or text) in memory. CSV keeps
+    the layout of DataFrame.to_csv (header, timestamps as
+    'YYYY-MM-DD HH:MM:SS', empty fields for NULL).
+
+    Parameters:
+    -----------
+    - sql_statement : str
+        Query to export.
+    - fmt : str
+        One of EXPORT_FORMATS.
+    - chunk_rows : int
+        Rows per chunk.
+
+    Yields:
+    -------
+    - str or bytes
+        Consecutive chunks of the file.
+    """
+    chunks = _query_chunks(sql_statement, chunk_rows)
+    if fmt == 'csv':
+        for i, (description, rows) in enumerate(chunks):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            if i == 0:
+                writer.writerow([column.name for column in description])
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    else:
+        batches = (_record_batch(description, rows) for description, rows in chunks)
+        yield from _write_batches(batches, fmt)
+
+
+def stream_frame(data, fmt='csv', chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Stream a DataFrame (index included) as CSV, Parquet or Arrow, one
+    slice of `chunk_rows` rows at a time, instead of rendering the whole
+    file in memory next to the DataFrame.
+
+    Parameters:
+    -----------
+    - data : pd.DataFrame
+        Data to export.
+    - fmt : str
+        One of EXPORT_FORMATS.
+    - chunk_rows : int
+        Rows per chunk.
+
+    Yields:
+    -------
+    - str or bytes
+        Consecutive chunks of the file.
+    """
+    starts = range(0, max(len(data), 1), chunk_rows)
+    if fmt == 'csv':
+        for start in starts:
+            yield data.iloc[start:start + chunk_rows].to_csv(header=start == 0, index=True)
+    else:
+        import pyarrow as pa
+        batches = (
+            pa.RecordBatch.from_pandas(data.iloc[start:start + chunk_rows], preserve_index=True)
+            for start in starts)
+        yield from _write_batches(batches, fmt)
+
+
+def export_response(content, fmt, filename):
+    """
+    Streaming download of `content` (from stream_query or stream_frame).
+
+    Parameters:
+    -----------
+    - content : iterator
+        Chunks of the file.
+    - fmt : str
+        Requested format (the `format` query parameter, 'csv' by default).
+    - filename : str
+        Name of the downloaded file, without extension.
+
+    Returns:
+    --------
+    - StreamingHttpResponse
+        The file as an attachment, or a 400 response for unknown formats.
+    """
+    if fmt not in EXPORT_FORMATS:
+        content.close()
+        return HttpResponseBadRequest(
+            f"Unknown format '{fmt}', use one of: {', '.join(EXPORT_FORMATS)}")
+    content_type, extension = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
@@ -0,0 +1,92 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+from common.database import get_connection
+
+
+
+###############################################################################
+#                          SQL SIDE GEOJSON BUILDER                           #
+###############################################################################
+# Features fetched from the server side cursor per round trip
+FEATURE_BATCH_SIZE = 2000
+
+# Alert level of each forecast day, shared by the alert layers (joined as 'ag')
+ALERT_DAY_PROPERTIES = [(f"d{day:02d}", f"ag.d{day:02d}") for day in range(1, 16)]
+
+
+def point_features_sql(properties, from_clause, longitude, latitude):
+    """
+    Build a query returning one GeoJSON Point feature (as text) per row.
+
+    The features are assembled by Postgres with json_build_object, so the
+    rows never go through pandas, shapely or geopandas. Features keep the
+    layout of GeoDataFrame.__geo_interface__ ('id' is the row number, as a
+    string, and 'geometry' a Point in lon/lat).
+
+    Parameters:
+    -----------
+    - properties : list of (str, str)
+        Property names and the SQL expressions producing them.
+    - from_clause : str
+        FROM / JOIN / WHERE part of the query.
+    - longitude : str
+        SQL expression of the longitude.
+    - latitude : str
+        SQL expression of the latitude.
+
+    Returns:
+    --------
+    - str
+        SQL statement with a single text column named 'feature'.
+    """
+    props = ",\n                ".join(f"'{name}', {expr}" for name, expr in properties)
+    return f"""
+        SELECT json_build_object(
+            'id', (row_number() OVER () - 1)::text,
+            'type', 'Feature',
+            'properties', json_build_object(
+                {props}),
+            'geometry', json_build_object(
+                'type', 'Point',
+                'coordinates', json_build_array(
+                    ({longitude})::float8, ({latitude})::float8))
+        )::text AS feature
+        {from_clause}
+    """
+
+
+def stream_feature_collection(sql_statement, batch_size=FEATURE_BATCH_SIZE):
+    """
+    Stream a GeoJSON FeatureCollection from a query built by
+    `point_features_sql`.
+
+    Rows are read through a server side cursor, `batch_size` features at a
+    time, and written out as soon as they arrive, so neither the full result
+    set nor the full document is held in memory. The pooled connection is
+    returned when the generator is exhausted or closed (Django closes it
+    when the response ends).
+
+    Parameters:
+    -----------
+    - sql_statement : str
+        Query with a single text column holding one feature per row.
+    - batch_size : int
+        Number of features fetched per round trip.
+
+    Yields:
+    -------
+    - str
+        Consecutive chunks of the GeoJSON document.
+    """
+    con = get_connection()
+    try:
+        result = con.execution_options(yield_per=batch_size).exec_driver_sql(sql_statement)
+        yield '{"type": "FeatureCollection", "features": ['
+        separator = ""
+        for partition in result.partitions():
+            yield separator + ", ".join(row[0] for row in partition)
+            separator = ", "
+        yield ']}'
+    finally:
+        con.close()
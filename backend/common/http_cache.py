@@ -0,0 +1,148 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import os
+import asyncio
+import hashlib
+import datetime as dt
+from functools import wraps
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+from common.cache import FORECAST_CACHE_STAMP, HISTORICAL_CACHE_STAMP
+
+
+
+###############################################################################
+#                         CONDITIONAL RESPONSE CACHE                          #
+###############################################################################
+# Cache alias configured in config/settings.py
+RESPONSE_CACHE_ALIAS = 'responses'
+
+# Files touched by the ingestion scripts when they finish a run
+INGESTION_STAMPS = [FORECAST_CACHE_STAMP, HISTORICAL_CACHE_STAMP]
+
+
+def get_ingestion_generation():
+    """
+    Generation number of the data served by the forecast endpoints: the
+    latest modification time (ns) of the ingestion stamp files, 0 if none
+    exists yet. It changes every time update_ensemble_forecast.py (or any
+    other ingestion script touching a stamp) finishes a run.
+    """
+    generation = 0
+    for path in INGESTION_STAMPS:
+        try:
+            generation = max(generation, os.stat(path).st_mtime_ns)
+        except OSError:
+            pass
+    return generation
+
+
+def _last_modified(request, *args, **kwargs):
+    generation = get_ingestion_generation()
+    if generation == 0:
+        return None
+    return dt.datetime.fromtimestamp(generation / 1e9, tz=dt.timezone.utc)
+
+
+def _store_when_done(cache, key, response, content):
+    # Pass the chunks of a streaming response through and cache the whole
+    # body, as a regular response, once the last chunk was sent
+    chunks = []
+    for chunk in content:
+        chunks.append(chunk)
+        yield chunk
+    cached = HttpResponse(b"".join(chunks), status=response.status_code)
+    for header, value in response.items():
+        cached[header] = value
+    cache.set(key, cached)
+
+
+def cache_response(*params):
+    """
+    Cache the responses of a view keyed on the given query parameters and
+    the ingestion generation, with conditional GET support.
+
+    The ETag is derived from the cache key, so a client revalidating with
+    If-None-Match (or If-Modified-Since) gets a 304 without the view being
+    executed. A new ingestion run changes the generation, and with it every
+    key, so stale entries are never served (they expire by TIMEOUT).
+    Streaming responses are stored once they were sent completely. Only
+    200 responses are stored and carry an ETag; errors are sent with
+    Cache-Control: no-store, so a transient failure is not kept.
+
+    Parameters:
+    -----------
+    - params : str
+        Names of the query parameters that determine the response, e.g.
+        'comid', 'date', 'width'. URL arguments (e.g. the z/x/y of a tile)
+        are always part of the key.
+    """
+    def decorator(view):
+        def _etag(request, *args, **kwargs):
+            values = [request.GET.get(param, '') for param in params]
+            values += [f"{name}={value}" for name, value in sorted(kwargs.items())]
+            values = ":".join(values)
+            key = f"{view.__module__}.{view.__name__}:{get_ingestion_generation()}:{values}"
+            return hashlib.sha1(key.encode()).hexdigest()
+
+        def _store(cache, key, response):
+            if response.status_code == 200 and response.streaming:
+                response.streaming_content = _store_when_done(
+                    cache, key, response, response.streaming_content)
+            elif response.status_code == 200:
+                cache.set(key, response)
+
+        def _finish(response):
+            # Validators only on complete 200 results: an error must not be
+            # revalidated (304) or kept by the browser
+            if response.status_code not in (200, 304):
+                response.headers.pop("ETag", None)
+                response.headers.pop("Last-Modified", None)
+                patch_cache_control(response, no_store=True)
+            return response
+
+        if asyncio.iscoroutinefunction(view):
+            # Async views (ASGI): same key and headers; `condition` only
+            # decorates sync views in Django 4.1
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key = _etag(request, *args, **kwargs)
+                last_modified = _last_modified(request)
+                timestamp = last_modified and int(last_modified.timestamp())
+                response = get_conditional_response(
+                    request, etag=quote_etag(key), last_modified=timestamp)
+                if response is None:
+                    cache = caches[RESPONSE_CACHE_ALIAS]
+                    response = cache.get(key)
+                    if response is None:
+                        response = await view(request, *args, **kwargs)
+                        _store(cache, key, response)
+                    patch_cache_control(response, no_cache=True)
+                if request.method in ("GET", "HEAD"):
+                    if timestamp and not response.has_header("Last-Modified"):
+                        response.headers["Last-Modified"] = http_date(timestamp)
+                    response.headers.setdefault("ETag", quote_etag(key))
+                return _finish(response)
+            return async_wrapper
+
+        @condition(etag_func=_etag, last_modified_func=_last_modified)
+        def conditional_view(request, *args, **kwargs):
+            cache = caches[RESPONSE_CACHE_ALIAS]
+            key = _etag(request, *args, **kwargs)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                _store(cache, key, response)
+            # Browsers must revalidate (cheap 304) instead of guessing freshness
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return _finish(conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
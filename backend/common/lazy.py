@@ -0,0 +1,76 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import importlib
+import threading
+
+
+
+###############################################################################
+#                           DEFERRED MODULE IMPORTS                           #
+###############################################################################
+_lazy_modules = []
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Heavy libraries (scipy, plotly, geopandas, rasterio, hydrostats, ...)
+    are only needed by some endpoints, so importing them when the views are
+    loaded makes every worker start pay for all of them. Submodules are
+    resolved on access too (e.g. `scipy.stats` on a lazy `scipy`).
+    """
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        module = self._load()
+        try:
+            return getattr(module, attr)
+        except AttributeError:
+            return importlib.import_module(f"{self.__dict__['_name']}.{attr}")
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Return a LazyModule for `name`, to be used as `import name as alias`.
+
+    Parameters:
+    -----------
+    - name : str
+        Full module name, e.g. 'plotly.graph_objects'.
+
+    Returns:
+    --------
+    - LazyModule
+        Proxy importing the module the first time it is used.
+    """
+    module = LazyModule(name)
+    _lazy_modules.append(module)
+    return module
+
+
+def load_lazy_modules():
+    """Import every module deferred with `lazy_import` (see common.warmup)."""
+    for module in _lazy_modules:
+        module._load()
@@ -0,0 +1,316 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import json
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import ProgrammingError
+from common.bias_correction import station_freshness_sql, series_until
+
+
+
+###############################################################################
+#                      GOODNESS OF FIT METRICS ENGINE                         #
+###############################################################################
+# Metric names, as the hydrostats abbreviations (same rows in the tables),
+# plus the percent bias. The formulas are the ones of HydroErr.
+METRICS = [
+    "ME", "RMSE", "NRMSE (Mean)", "MAPE", "NSE", "KGE (2009)", "KGE (2012)",
+    "R (Pearson)", "R (Spearman)", "r2", "PBIAS"]
+
+# Periods: the full series, each month and each season (meteorological)
+FULL_SERIES = 'all'
+MONTHS = [f"{month:02d}" for month in range(1, 13)]
+SEASONS = ['DJF', 'MAM', 'JJA', 'SON']
+PERIODS = [FULL_SERIES] + MONTHS + SEASONS
+_SEASON_OF_MONTH = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+
+def align(observed, **series) -> dict:
+    """
+    Pair each series with the observations, looking the observed dates up
+    once per series. Rows where either value is NaN or infinite are left
+    out, as hydrostats merge_data + make_table do.
+
+    Parameters:
+    -----------
+    - observed : pd.DataFrame or pd.Series
+        Observed values with a DatetimeIndex.
+    - **series : pd.DataFrame or pd.Series
+        Simulated series to evaluate (e.g. simulated=..., corrected=...),
+        first column used.
+
+    Returns:
+    --------
+    - dict
+        name -> (DatetimeIndex, simulated values, observed values).
+    """
+    observed = observed.iloc[:, 0] if isinstance(observed, pd.DataFrame) else observed
+    obs_values = observed.to_numpy(dtype=float)
+    obs_finite = np.isfinite(obs_values)
+    aligned = {}
+    for name, simulated in series.items():
+        simulated = simulated.iloc[:, 0] if isinstance(simulated, pd.DataFrame) else simulated
+        positions = simulated.index.get_indexer(observed.index)
+        sim_values = simulated.to_numpy(dtype=float)[positions]
+        keep = (positions >= 0) & obs_finite & np.isfinite(sim_values)
+        aligned[name] = (observed.index[keep], sim_values[keep], obs_values[keep])
+    return aligned
+
+
+def _average_ranks(values, groups):
+    # Ranks within each group, ties sharing their average rank (as
+    # scipy.stats.rankdata). The order inside a tie does not matter, so the
+    # values are sorted with the default sort and then (stable) by group
+    ranks = np.empty(len(values))
+    if len(values) == 0:
+        return ranks
+    order = np.argsort(values)
+    order = order[np.argsort(groups.astype(np.int16)[order], kind='stable')]
+    sorted_values, sorted_groups = values[order], groups[order]
+    positions = np.arange(len(values))
+    group_start = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    first = np.maximum.accumulate(np.where(group_start, positions, 0))
+    rank = (positions - first + 1).astype(float)
+    run = np.cumsum(group_start | np.r_[True, sorted_values[1:] != sorted_values[:-1]]) - 1
+    ranks[order] = (np.bincount(run, rank) / np.bincount(run))[run]
+    return ranks
+
+
+def _correlation(x, y, groups, size):
+    # Pearson correlation per group from the deviations to the group means
+    count = np.bincount(groups, minlength=size)
+    x_dev = x - (np.bincount(groups, x, size) / count)[groups]
+    y_dev = y - (np.bincount(groups, y, size) / count)[groups]
+    top = np.bincount(groups, x_dev * y_dev, size)
+    x_ss = np.bincount(groups, x_dev ** 2, size)
+    y_ss = np.bincount(groups, y_dev ** 2, size)
+    return top / (np.sqrt(y_ss) * np.sqrt(x_ss)), x_ss, y_ss
+
+
+def grouped_metrics(simulated, observed, groups, size) -> dict:
+    """
+    Every metric of METRICS for `size` groups of aligned values at once:
+    each statistic is one weighted np.bincount over the arrays, so the cost
+    does not grow with the number of metrics or groups. Empty groups, and
+    the KGE of groups with a zero observed mean or deviation, get NaN.
+
+    Parameters:
+    -----------
+    - simulated, observed : np.ndarray
+        Aligned values (see `align`).
+    - groups : np.ndarray
+        Group (0 .. size - 1) of each value.
+    - size : int
+        Number of groups.
+
+    Returns:
+    --------
+    - dict
+        Metric name -> np.ndarray with one value per group.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = np.bincount(groups, minlength=size)
+        sim_mean = np.bincount(groups, simulated, size) / count
+        obs_mean = np.bincount(groups, observed, size) / count
+        error = simulated - observed
+        error_sum = np.bincount(groups, error, size)
+        squared_error = np.bincount(groups, error ** 2, size)
+        r, sim_ss, obs_ss = _correlation(simulated, observed, groups, size)
+        rank_r, _, _ = _correlation(
+            _average_ranks(simulated, groups), _average_ranks(observed, groups), groups, size)
+        #
+        # KGE components: correlation, variability (std or CV ratio) and bias
+        alpha = np.sqrt(sim_ss) / np.sqrt(obs_ss)
+        beta = sim_mean / obs_mean
+        gamma = alpha / beta
+        valid = (obs_mean != 0) & (obs_ss != 0)
+        kge_2009 = 1 - np.sqrt((r - 1) ** 2 + (alpha - 1) ** 2 + (beta - 1) ** 2)
+        kge_2012 = 1 - np.sqrt((r - 1) ** 2 + (gamma - 1) ** 2 + (beta - 1) ** 2)
+        rmse = np.sqrt(squared_error / count)
+        return {
+            "ME": error_sum / count,
+            "RMSE": rmse,
+            "NRMSE (Mean)": rmse / obs_mean,
+            "MAPE": 100 * np.bincount(groups, np.abs(error / observed), size) / count,
+            "NSE": 1 - squared_error / obs_ss,
+            "KGE (2009)": np.where(valid, kge_2009, np.nan),
+            "KGE (2012)": np.where(valid & (sim_mean != 0), kge_2012, np.nan),
+            "R (Pearson)": r,
+            "R (Spearman)": rank_r,
+            "r2": r ** 2,
+            "PBIAS": 100 * error_sum / np.bincount(groups, observed, size)}
+
+
+def _period_groups(months, by):
+    # months: month of each value, 0 based
+    if by is None:
+        return np.zeros(len(months), dtype=np.intp), [FULL_SERIES]
+    if by == 'month':
+        return months, MONTHS
+    if by == 'season':
+        return _SEASON_OF_MONTH[months], SEASONS
+    raise ValueError(f"by must be None, 'month' or 'season', not {by!r}")
+
+
+def goodness_of_fit(index, simulated, observed, by=None) -> pd.DataFrame:
+    """
+    Metrics of aligned values for the full series, each month or each
+    season. Several groupings are evaluated together (one bincount per
+    statistic for all of them) when `by` is a list.
+
+    Parameters:
+    -----------
+    - index : pd.DatetimeIndex
+        Dates of the values.
+    - simulated, observed : np.ndarray
+        Aligned values (see `align`).
+    - by : str or list, optional
+        None (full series), 'month', 'season' or a list of them.
+
+    Returns:
+    --------
+    - pd.DataFrame
+        One row per period (FULL_SERIES, MONTHS and/or SEASONS) and one
+        column per metric of METRICS.
+    """
+    groupings = by if isinstance(by, (list, tuple)) else [by]
+    months = index.month.to_numpy() - 1
+    groups, labels = [], []
+    for grouping in groupings:
+        period_groups, period_labels = _period_groups(months, grouping)
+        groups.append(period_groups + len(labels))
+        labels += period_labels
+    values = grouped_metrics(
+        np.tile(simulated, len(groupings)), np.tile(observed, len(groupings)),
+        np.concatenate(groups), len(labels))
+    return pd.DataFrame(values, index=labels, columns=METRICS)
+
+
+def station_metrics(observed, **series) -> dict:
+    """
+    Metrics of every series against the observations for all the PERIODS.
+
+    Returns:
+    --------
+    - dict
+        name -> period -> metric -> value (None for NaN), ready for JSON.
+    """
+    result = {}
+    for name, (index, simulated, obs) in align(observed, **series).items():
+        table = goodness_of_fit(index, simulated, obs, by=[None, 'month', 'season'])
+        result[name] = {
+            period: {metric: (float(value) if np.isfinite(value) else None)
+                     for metric, value in zip(METRICS, row)}
+            for period, row in zip(table.index, table.to_numpy())}
+    return result
+
+
+
+###############################################################################
+#                       STORED METRICS PER STATION                            #
+###############################################################################
+def store_station_metrics(con, code, comid, variable, method, metrics, historical, observed):
+    """
+    Write (or replace) the metrics of a station, with the size and last
+    date of the series they were computed on. Nothing is written if the
+    table does not exist yet.
+    """
+    try:
+        con.exec_driver_sql("""
+            INSERT INTO station_metrics
+                (code, comid, variable, method, observed_count, observed_until,
+                 simulated_until, metrics, updated)
+            VALUES (%(code)s, %(comid)s, %(variable)s, %(method)s, %(observed_count)s,
+                    %(observed_until)s, %(simulated_until)s, %(metrics)s, now())
+            ON CONFLICT (code, comid, variable, method) DO UPDATE SET
+                observed_count = EXCLUDED.observed_count,
+                observed_until = EXCLUDED.observed_until,
+                simulated_until = EXCLUDED.simulated_until,
+                metrics = EXCLUDED.metrics,
+                updated = EXCLUDED.updated
+        """, {
+            "code": code,
+            "comid": int(comid),
+            "variable": variable,
+            "method": method,
+            "observed_count": len(observed),
+            "observed_until": series_until(observed.index),
+            "simulated_until": series_until(historical.index),
+            "metrics": json.dumps(metrics)})
+        con.commit()
+    except ProgrammingError:
+        con.rollback()
+
+
+def get_station_metrics(con, code, comid, variable, method, observed, historical,
+                        store=False, **series):
+    """
+    Goodness of fit metrics of a station (see `station_metrics`).
+
+    They are stored in station_metrics by the nightly job
+    (taskfiles/geoglows/update_station_metrics.py) and read back while the
+    last observation of the station and the last simulation of the reach
+    are unchanged, so the plots and the validation map do not evaluate the
+    series again. Otherwise a request computes them without writing.
+
+    Parameters:
+    -----------
+    - con : sqlalchemy.engine.Connection
+        Database connection.
+    - code : str
+        Station code.
+    - comid : int
+        The COMID of the river reach.
+    - variable : str
+        'streamflow' or 'waterlevel'.
+    - method : str
+        Bias correction method of the corrected series.
+    - observed : pd.DataFrame
+        Observations of the station (all of them, as in {variable}_data).
+    - historical : pd.DataFrame
+        Historical simulation of the reach.
+    - store : bool, optional
+        Compare the number of observations too and store the metrics
+        computed again (nightly jobs only).
+    - **series : pd.DataFrame
+        Series to evaluate (e.g. simulated=..., corrected=...).
+
+    Returns:
+    --------
+    - dict
+        name -> period -> metric -> value.
+    """
+    fresh = station_freshness_sql(f"'{code}'", comid, variable, count=store)
+    try:
+        row = con.exec_driver_sql(f"""
+            SELECT metrics FROM station_metrics
+            WHERE code='{code}' AND comid={comid} AND variable='{variable}' AND method='{method}'
+              AND {fresh}
+        """).first()
+    except ProgrammingError:
+        # Table not created yet: compute without storing
+        con.rollback()
+        row = None
+    if row is not None and set(row[0]) == set(series):
+        return row[0]
+    metrics = station_metrics(observed, **series)
+    if store:
+        store_station_metrics(con, code, comid, variable, method, metrics, historical, observed)
+    return metrics
+
+
+def stale_stations_sql(stations_table, variable, method):
+    """
+    Query of the stations (code, comid) of `stations_table` without fresh
+    metrics for `method`.
+    """
+    fresh = station_freshness_sql("st.code", "st.comid", variable)
+    return f"""
+        SELECT st.code, st.comid FROM {stations_table} st
+        WHERE NOT EXISTS (
+            SELECT 1 FROM station_metrics
+            WHERE code=st.code AND comid=st.comid AND variable='{variable}'
+              AND method='{method}' AND {fresh})
+        ORDER BY st.code
+    """
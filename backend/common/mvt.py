@@ -0,0 +1,174 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import math
+import struct
+import numpy as np
+
+
+
+###############################################################################
+#                          WEB MERCATOR TILE GRID                             #
+###############################################################################
+# Tile resolution (MVT default) and Web Mercator latitude limit
+TILE_EXTENT = 4096
+MAX_LATITUDE = 85.0511287798
+
+# Margin (tile units) so markers on the tile edges are drawn in both tiles
+TILE_BUFFER = 64
+
+# Below this zoom only the most relevant point of each cell is kept
+FULL_DETAIL_ZOOM = 10
+THINNING_CELL = 128
+
+
+def tile_bounds(z, x, y, buffer=0):
+    """
+    Longitude/latitude bounds of a XYZ tile.
+
+    Parameters:
+    -----------
+    - z, x, y : int
+        Zoom level and column/row of the tile (origin at the top left).
+    - buffer : int
+        Extra margin, in tile units (TILE_EXTENT per tile).
+
+    Returns:
+    --------
+    - tuple
+        (west, south, east, north) in degrees.
+    """
+    n = 2 ** z
+    margin = buffer / TILE_EXTENT
+    def lon(tx):
+        return tx / n * 360.0 - 180.0
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+    return (lon(x - margin), lat(y + 1 + margin), lon(x + 1 + margin), lat(y - margin))
+
+
+def project_points(longitude, latitude, z, x, y):
+    """
+    Project lon/lat points to the integer coordinates of a tile.
+
+    Returns:
+    --------
+    - tuple of np.ndarray
+        Column and row of every point in tile units (0 to TILE_EXTENT
+        inside the tile, y growing downwards).
+    """
+    n = 2 ** z
+    lon = np.asarray(longitude, dtype=float)
+    lat = np.radians(np.clip(np.asarray(latitude, dtype=float), -MAX_LATITUDE, MAX_LATITUDE))
+    px = ((lon + 180.0) / 360.0 * n - x) * TILE_EXTENT
+    py = ((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n - y) * TILE_EXTENT
+    return np.round(px).astype(np.int64), np.round(py).astype(np.int64)
+
+
+def thin_points(px, py, priority, z):
+    """
+    Zoom dependent thinning: below FULL_DETAIL_ZOOM the tile is split in
+    cells of THINNING_CELL units and only the point with the highest
+    priority of each cell is kept, so low zoom tiles stay small while the
+    most severe alerts remain visible.
+
+    Returns:
+    --------
+    - np.ndarray
+        Sorted indices of the points to keep.
+    """
+    if z >= FULL_DETAIL_ZOOM or len(px) == 0:
+        return np.arange(len(px))
+    cells = (py // THINNING_CELL) * (2 * TILE_EXTENT) + (px // THINNING_CELL)
+    # Highest priority first, then the first point of each cell
+    order = np.lexsort((-np.asarray(priority), cells))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cells[order][1:] != cells[order][:-1]
+    return np.sort(order[first])
+
+
+
+###############################################################################
+#                          MAPBOX VECTOR TILE ENCODER                         #
+###############################################################################
+# Minimal protobuf writer for point layers (MVT specification 2.1)
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _message(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _value(value):
+    # Value message: string (1), double (3) or sint (6)
+    if isinstance(value, str):
+        return _message(1, value.encode())
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return _key(6, 0) + _varint(_zigzag(int(value)))
+    return _key(3, 1) + struct.pack('<d', float(value))
+
+
+def encode_point_layer(name, px, py, properties, ids=None):
+    """
+    Encode a Mapbox Vector Tile with one layer of points.
+
+    Parameters:
+    -----------
+    - name : str
+        Layer name.
+    - px, py : np.ndarray
+        Tile coordinates of the points (see `project_points`).
+    - properties : dict
+        Property name -> list of values (str, int or float, None to omit).
+    - ids : array-like, optional
+        Feature ids (non negative integers).
+
+    Returns:
+    --------
+    - bytes
+        The tile, ready to be sent as application/vnd.mapbox-vector-tile.
+    """
+    keys = list(properties)
+    values = {}
+    features = []
+    columns = [properties[key] for key in keys]
+    for i in range(len(px)):
+        tags = bytearray()
+        for k, column in enumerate(columns):
+            value = column[i]
+            if value is None:
+                continue
+            if isinstance(value, float) and math.isnan(value):
+                continue
+            v = values.setdefault((type(value).__name__, value), len(values))
+            tags += _varint(k) + _varint(v)
+        geometry = _varint(9) + _varint(_zigzag(int(px[i]))) + _varint(_zigzag(int(py[i])))
+        feature = b""
+        if ids is not None:
+            feature += _key(1, 0) + _varint(int(ids[i]))
+        feature += _message(2, bytes(tags)) + _key(3, 0) + _varint(1) + _message(4, geometry)
+        features.append(_message(2, feature))
+    #
+    layer = _key(15, 0) + _varint(2) + _message(1, name.encode())
+    layer += b"".join(features)
+    layer += b"".join(_message(3, key.encode()) for key in keys)
+    layer += b"".join(_message(4, _value(value)) for _, value in values)
+    layer += _key(5, 0) + _varint(TILE_EXTENT)
+    return _message(3, layer)
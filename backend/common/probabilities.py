@@ -0,0 +1,142 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import ProgrammingError
+from common.lazy import lazy_import
+from common.ensemble import daily_window_max, exceedance_probabilities
+from common.ensemble import ALERT_RETURN_PERIODS, HIGH_RES_MEMBER
+
+jinja2 = lazy_import("jinja2")
+
+
+
+###############################################################################
+#                         EXCEEDANCE PROBABILITY TABLE                        #
+###############################################################################
+def probability_matrix(ensemble: pd.DataFrame, thresholds):
+    """
+    Day x return period matrix of the probabilities table, as whole
+    percentages of the ensemble members above each threshold.
+
+    The table covers the days between the first and last forecast times of
+    the ensemble statistics and only uses the time steps where every member
+    but the high resolution one has a value. The backend calls it for the
+    forecasts without a stored matrix, and
+    taskfiles/geoglows/update_ensemble_forecast.py imports it to fill the
+    forecast_probabilities table.
+
+    Parameters:
+    -----------
+    - ensemble : pd.DataFrame
+        Ensemble forecast with one column per member and a datetime index.
+    - thresholds : array-like
+        Return period thresholds, ordered as ALERT_RETURN_PERIODS.
+
+    Returns:
+    --------
+    - tuple(pd.Timestamp, np.ndarray) or None
+        Start of the first day and the (day x return period) int16 matrix,
+        or None if no time step of the forecast has a value.
+    """
+    members = ensemble.drop(columns=[HIGH_RES_MEMBER])
+    complete = members.notna().all(axis=1).to_numpy()
+    valid = complete | ensemble[HIGH_RES_MEMBER].notna().to_numpy()
+    dates = ensemble.index[valid]
+    if dates.empty:
+        return None
+    startdate, enddate = dates.min(), dates.max()
+    _, daily_max = daily_window_max(members[complete], startdate, enddate)
+    probabilities = exceedance_probabilities(daily_max, thresholds, members=52)
+    return startdate, np.rint(probabilities).astype(np.int16)
+
+
+def get_stored_probabilities(con, comid, date):
+    """
+    Read the probabilities table of a reach computed at ingestion time.
+
+    Parameters:
+    -----------
+    - con : sqlalchemy.engine.Connection
+        Database connection.
+    - comid : int
+        The COMID of the river reach.
+    - date : str
+        Initialization date of the ensemble forecast.
+
+    Returns:
+    --------
+    - tuple(pd.Timestamp, np.ndarray) or None
+        Start of the first day and the (day x return period) matrix, or None
+        if it was not stored (or the table does not exist yet).
+    """
+    try:
+        row = con.exec_driver_sql(stored_probabilities_sql(comid, date)).mappings().first()
+    except ProgrammingError:
+        con.rollback()
+        return None
+    return None if row is None else stored_probabilities_from_row(row)
+
+
+def stored_probabilities_sql(comid, date):
+    """Query of the stored probabilities table of a reach and forecast."""
+    return f"""SELECT startdate, probabilities FROM forecast_probabilities
+               WHERE comid={comid} AND initialized='{date}'"""
+
+
+def stored_probabilities_from_row(row):
+    """(startdate, day x return period matrix) of a forecast_probabilities row."""
+    probabilities = np.asarray(row['probabilities'], dtype=np.int16)
+    return pd.Timestamp(row['startdate']), probabilities.reshape(-1, len(ALERT_RETURN_PERIODS))
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def _compiled_template(path):
+    # Templates are read and compiled once per process
+    template = _templates.get(path)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(path)
+            if template is None:
+                with open(path) as file:
+                    template = jinja2.Template(file.read())
+                _templates[path] = template
+    return template
+
+
+def render_probabilities_table(path, startdate, probabilities, colors):
+    """
+    Render a probabilities_table.html template.
+
+    Parameters:
+    -----------
+    - path : str
+        Path of the template.
+    - startdate : pd.Timestamp
+        Start of the first day of the table.
+    - probabilities : np.ndarray
+        (day x return period) matrix of percentages.
+    - colors : dict
+        Colors of the return periods ('2 Year', '5 Year', ...).
+
+    Returns:
+    --------
+    - str
+        The HTML table.
+    """
+    days = pd.date_range(startdate, periods=len(probabilities), freq='D')
+    r2, r5, r10, r25, r50, r100 = np.asarray(probabilities, dtype=int).T.tolist()
+    return _compiled_template(path).render(
+        days=days.strftime('%b %d').tolist(),
+        r2=r2,
+        r5=r5,
+        r10=r10,
+        r25=r25,
+        r50=r50,
+        r100=r100,
+        colors=colors)
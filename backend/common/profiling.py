@@ -0,0 +1,217 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from functools import wraps
+import numpy as np
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+
+
+
+###############################################################################
+#                         NAMED SPANS OF A REQUEST                            #
+###############################################################################
+# Durations (s) of the spans of the request being served, by span name
+_spans = contextvars.ContextVar('profiling_spans', default=None)
+
+
+class span:
+    """
+    Time a named part of the request being served, e.g.
+
+        with span("db"):
+            data = load_forecast_bundle(comid, date)
+
+    Durations of spans with the same name are added up. Spans may be nested
+    (the outer one includes the inner one). Outside a request, or in threads
+    started without copying the context, nothing is recorded.
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        spans = _spans.get()
+        if spans is not None:
+            spans[self.name] = spans.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def profiled(name):
+    """Decorator recording every call of a function as span `name`."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+
+###############################################################################
+#                      IN-PROCESS LATENCY PERCENTILES                         #
+###############################################################################
+# Durations kept per view and span to compute the percentiles
+LATENCY_WINDOW = int(os.getenv('LATENCY_WINDOW', 1024))
+LATENCY_QUANTILES = [0.5, 0.9, 0.99]
+
+
+class LatencyStore:
+    """
+    Count, sum and the last LATENCY_WINDOW durations of every key (view, or
+    view and span), from which the percentiles are computed on demand.
+    """
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key, seconds):
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0, 0.0, deque(maxlen=self.window)]
+            series[0] += 1
+            series[1] += seconds
+            series[2].append(seconds)
+
+    def summary(self):
+        """{key: (count, sum, [percentiles of LATENCY_QUANTILES])}"""
+        with self._lock:
+            series = {key: (count, total, list(values))
+                      for key, (count, total, values) in self._series.items()}
+        return {
+            key: (count, total, np.quantile(values, LATENCY_QUANTILES).tolist())
+            for key, (count, total, values) in series.items()}
+
+
+request_latency = LatencyStore()
+span_latency = LatencyStore()
+
+
+
+###############################################################################
+#                          PROFILING MIDDLEWARE                               #
+###############################################################################
+class ProfilingMiddleware:
+    """
+    Time every request and the spans recorded while serving it.
+
+    The durations go to the per view percentiles exposed by `metrics_text`,
+    and with SERVER_TIMING enabled to a `Server-Timing` header, shown by the
+    browser developer tools next to the request. The time of a streaming
+    response stops when its body starts being sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = asyncio.iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        spans = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self._finish(request, response, spans, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        spans = {}
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _spans.reset(token)
+        return self._finish(request, response, spans, time.perf_counter() - start)
+
+    def _finish(self, request, response, spans, total):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        request_latency.observe(view, total)
+        for name, seconds in spans.items():
+            span_latency.observe((view, name), seconds)
+        if settings.SERVER_TIMING:
+            timings = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans.items()]
+            timings.append(f"total;dur={total * 1000:.1f}")
+            response['Server-Timing'] = ", ".join(timings)
+        return response
+
+
+
+###############################################################################
+#                          PROMETHEUS TEXT FORMAT                             #
+###############################################################################
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _summary(lines, metric, help_text, summary, labels):
+    lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} summary")
+    for key, (count, total, percentiles) in sorted(summary.items()):
+        names = labels(key)
+        for quantile, value in zip(LATENCY_QUANTILES, percentiles):
+            lines.append(f'{metric}{{{names},quantile="{quantile}"}} {value:.6f}')
+        lines.append(f'{metric}_sum{{{names}}} {total:.6f}')
+        lines.append(f'{metric}_count{{{names}}} {count}')
+
+
+def metrics_text(gauges=None):
+    """
+    Latency summaries (and optional gauges) in the Prometheus text
+    exposition format.
+
+    Parameters:
+    -----------
+    - gauges : dict, optional
+        {metric name: (help text, value)} added as gauges, e.g. the state of
+        the connection pool.
+
+    Returns:
+    --------
+    - str
+        Body of the metrics endpoint (text/plain; version=0.0.4).
+    """
+    lines = []
+    _summary(
+        lines, "geoglows_request_duration_seconds",
+        f"Request duration per view (quantiles over the last {LATENCY_WINDOW} requests).",
+        request_latency.summary(),
+        lambda view: f'view="{_label(view)}"')
+    _summary(
+        lines, "geoglows_span_duration_seconds",
+        f"Duration of the named spans per view (quantiles over the last {LATENCY_WINDOW} requests).",
+        span_latency.summary(),
+        lambda key: f'view="{_label(key[0])}",span="{_label(key[1])}"')
+    for metric, (help_text, value) in (gauges or {}).items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
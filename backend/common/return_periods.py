@@ -0,0 +1,93 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import numpy as np
+import pandas as pd
+from sqlalchemy.exc import ProgrammingError
+
+
+
+###############################################################################
+#                        STORED RETURN PERIOD THRESHOLDS                      #
+###############################################################################
+RETURN_PERIODS = [100, 50, 25, 10, 5, 2]
+RETURN_PERIOD_COLUMNS = [f'return_period_{rp}' for rp in RETURN_PERIODS]
+
+
+def get_stored_return_periods(con, comid, code=None, table='return_periods'):
+    """
+    Read the precomputed return period thresholds of a river reach or station.
+
+    The thresholds are written by taskfiles/geoglows/update_return_periods.py
+    (river reaches) and update_corrected_simulation.py (stations) and read
+    here by primary key, so the endpoints do not need to scan the
+    full historical simulation to fit the Gumbel distribution again.
+
+    Parameters:
+    -----------
+    - con : sqlalchemy.engine.Connection
+        Database connection.
+    - comid : int
+        The COMID of the river reach. Used as index of the returned table.
+    - code : str, optional
+        Station code. When given the thresholds are read by station from
+        `table` (return_periods_streamflow or return_periods_waterlevel).
+    - table : str
+        Table holding the thresholds.
+
+    Returns:
+    --------
+    - pd.DataFrame or None
+        Same layout returned by `get_return_periods` (index 'rivid' and one
+        column per return period), or None if the thresholds were not
+        computed yet.
+    """
+    columns = ", ".join(RETURN_PERIOD_COLUMNS)
+    if code is None:
+        sql = f"SELECT {columns} FROM {table} WHERE comid={comid}"
+    else:
+        sql = f"SELECT {columns} FROM {table} WHERE code='{code}'"
+    try:
+        data = pd.read_sql(sql, con)
+    except ProgrammingError:
+        # Table not created yet: leave the connection usable for the fallback
+        con.rollback()
+        return None
+    if data.empty or data.isnull().values.any():
+        return None
+    data = data.iloc[[0]].astype(float)
+    data.index = pd.Index([comid], name='rivid')
+    return data
+
+
+def gumbel_return_periods(annual_max: pd.DataFrame, key: str = 'comid') -> pd.DataFrame:
+    """
+    Fit the Gumbel Type I distribution to the annual maximum flows of many
+    river reaches (or stations) at once, as `get_return_periods` does for
+    one series. Used by the batch endpoint and by the nightly jobs
+    (taskfiles/geoglows/update_return_periods.py for the whole network and
+    update_corrected_simulation.py for the stations).
+
+    Parameters:
+    -----------
+    - annual_max : pd.DataFrame
+        Long table with the columns `key` and 'value', one annual maximum
+        per row.
+    - key : str
+        Column identifying the reach ('comid') or station ('code').
+
+    Returns:
+    --------
+    - pd.DataFrame
+        One row per key (index) and one column per return period. Series
+        with a constant annual maximum get 0, as `gumbel_1`.
+    """
+    grouped = annual_max.groupby(key)['value']
+    mean = grouped.mean().to_numpy(dtype=float)
+    std = grouped.std(ddof=0).to_numpy(dtype=float)
+    #
+    # Gumbel reduced variate of each return period, broadcast (key x rp)
+    y = -np.log(-np.log(1 - (1 / np.array(RETURN_PERIODS, dtype=float))))
+    values = y[None, :] * std[:, None] * 0.7797 + mean[:, None] - (0.45 * std[:, None])
+    values[std <= 0, :] = 0
+    return pd.DataFrame(values, index=grouped.mean().index, columns=RETURN_PERIOD_COLUMNS)
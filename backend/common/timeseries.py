@@ -0,0 +1,79 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import numpy as np
+import pandas as pd
+import psycopg2.extensions
+
+
+
+###############################################################################
+#                           TYPED TIME SERIES READER                          #
+###############################################################################
+# Postgres type OIDs
+TIMESTAMP_OID = 1114
+NUMERIC_OIDS = (700, 701, 1700)
+
+# Keep timestamps as ISO text (parsed in bulk by numpy) and read NUMERIC as
+# float instead of building one datetime / Decimal object per row
+_TIMESTAMP_AS_TEXT = psycopg2.extensions.new_type(
+    (TIMESTAMP_OID,), 'TIMESTAMP_AS_TEXT', lambda value, cursor: value)
+_NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    NUMERIC_OIDS, 'NUMERIC_AS_FLOAT',
+    lambda value, cursor: None if value is None else float(value))
+
+
+def _raw_cursor(con):
+    # sqlalchemy Connection -> pooled DBAPI connection; psycopg2 connections
+    # are used as they are
+    dbapi_connection = getattr(con, 'connection', con)
+    return dbapi_connection.cursor()
+
+
+def read_time_series(sql_statement, con):
+    """
+    Read a time series query into a DataFrame indexed by 'datetime'.
+
+    Rows are fetched from a psycopg2 cursor with the timestamps kept as text
+    and NUMERIC values read as float, then each column is converted once to a
+    numpy array (datetime64[ns] for TIMESTAMP, float64 for numbers). This
+    avoids the pd.read_sql + to_datetime + strftime + to_datetime passes of
+    get_format_data, with the same result for TIMESTAMP columns.
+
+    Parameters:
+    -----------
+    - sql_statement : str
+        Query returning a 'datetime' column plus any value columns.
+    - con : sqlalchemy.engine.Connection or psycopg2 connection
+        Database connection.
+
+    Returns:
+    --------
+    - pd.DataFrame
+        One column per non 'datetime' column of the query, with a
+        DatetimeIndex named 'datetime'.
+    """
+    cursor = _raw_cursor(con)
+    try:
+        psycopg2.extensions.register_type(_TIMESTAMP_AS_TEXT, cursor)
+        psycopg2.extensions.register_type(_NUMERIC_AS_FLOAT, cursor)
+        cursor.execute(sql_statement)
+        description = cursor.description
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    #
+    # Transpose the rows and convert every column in one step
+    columns = list(zip(*rows)) if rows else [()] * len(description)
+    data = {}
+    for column, values in zip(description, columns):
+        if column.type_code == TIMESTAMP_OID:
+            data[column.name] = np.array(values, dtype='datetime64[ns]')
+        elif column.type_code in NUMERIC_OIDS:
+            data[column.name] = np.array(values, dtype=float)
+        else:
+            data[column.name] = list(values)
+    #
+    # Build the index once
+    index = pd.DatetimeIndex(data.pop('datetime'), name='datetime')
+    return pd.DataFrame(data, index=index)
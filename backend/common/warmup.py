@@ -0,0 +1,90 @@
+###############################################################################
+#                            LIBRARIES AND MODULES                            #
+###############################################################################
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from common.database import get_connection, POOL_SIZE
+from common.lazy import load_lazy_modules
+
+
+
+###############################################################################
+#                              WORKER WARM-UP                                 #
+###############################################################################
+logger = logging.getLogger(__name__)
+
+# WARMUP=1 enables the warm-up, WARMUP_COMIDS preloads the historical
+# simulation of the most requested reaches (comma separated COMIDs).
+# WARMUP_AFTER_FORK=1 when the application is loaded in the master process
+# (gunicorn --preload), so the warm-up runs in each worker after the fork
+WARMUP_ENABLED = os.getenv('WARMUP', '0') == '1'
+WARMUP_AFTER_FORK = os.getenv('WARMUP_AFTER_FORK', '0') == '1'
+WARMUP_COMIDS = [int(c) for c in os.getenv('WARMUP_COMIDS', '').split(',') if c.strip()]
+
+_registered = False
+
+
+def _open_connections():
+    # Check out POOL_SIZE connections at once so the pool keeps them open
+    def ping(_):
+        with get_connection() as con:
+            con.exec_driver_sql("SELECT 1")
+    with ThreadPoolExecutor(max_workers=POOL_SIZE) as executor:
+        list(executor.map(ping, range(POOL_SIZE)))
+
+
+def _load_views():
+    # Import the URL configuration (views and controllers), which registers
+    # the deferred modules, before the first request does
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+
+
+def _preload_historical_simulations():
+    from common.cache import get_historical_simulation
+    with get_connection() as con:
+        for comid in WARMUP_COMIDS:
+            get_historical_simulation(comid, con)
+
+
+def warm_up():
+    """
+    Prepare a freshly started worker before it receives traffic: fill the
+    connection pool, import the views and the libraries they defer with
+    common.lazy and preload the historical simulations of WARMUP_COMIDS.
+    Failures are logged and never stop the worker.
+    """
+    steps = (_open_connections, _load_views, load_lazy_modules,
+             _preload_historical_simulations)
+    for step in steps:
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %s failed", step.__name__)
+
+
+def start_warm_up():
+    """Run `warm_up` in a background thread, so the worker serves at once."""
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def register_warm_up():
+    """
+    Warm up every worker process once (called from config/wsgi.py and
+    config/asgi.py when WARMUP=1).
+
+    With WARMUP_AFTER_FORK=1 (application preloaded in the master, e.g.
+    gunicorn --preload) it runs after each fork, so the master never holds
+    pooled sockets or a running thread when it forks. Otherwise the
+    application is loaded by the worker itself and the warm-up starts here.
+    """
+    global _registered
+    if not WARMUP_ENABLED or _registered:
+        return
+    _registered = True
+    if WARMUP_AFTER_FORK:
+        os.register_at_fork(after_in_child=start_warm_up)
+    else:
+        start_warm_up()
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Optional warm-up of each worker (WARMUP=1), see common/warmup.py
+from common.warmup import register_warm_up
+register_warm_up()
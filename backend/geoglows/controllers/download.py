@@ -1,18 +1,143 @@
-import rasterio
-from django.http import HttpResponse
+import os
+import re
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from common.lazy import lazy_import
 
-ENDPOINT = "/usr/share/geoserver/data_dir/data" 
+# Only needed for bbox downloads
+rasterio = lazy_import("rasterio")
 
-def stream_file(workspace, layer, output):
+ENDPOINT = "/usr/share/geoserver/data_dir/data"
+
+# Bytes read per chunk when answering a Range request
+RANGE_BLOCK_SIZE = 64 * 1024
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    # Single byte range "bytes=start-end", "bytes=start-" or "bytes=-suffix".
+    # Returns (start, end) inclusive, None to send the whole file, or False
+    # if the range cannot be satisfied
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(file_path, start, end):
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(RANGE_BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _clip_file(file_path, bbox):
+    # Windowed read of the GeoTIFF inside bbox (lon/lat, EPSG:4326), written
+    # to an in-memory GeoTIFF with the same profile
+    with rasterio.open(file_path) as dataset:
+        if dataset.crs is not None and dataset.crs.to_epsg() != 4326:
+            bbox = rasterio.warp.transform_bounds("EPSG:4326", dataset.crs, *bbox)
+        window = rasterio.windows.from_bounds(*bbox, transform=dataset.transform)
+        full = rasterio.windows.Window(0, 0, dataset.width, dataset.height)
+        window = window.intersection(full).round_offsets().round_lengths()
+        data = dataset.read(window=window)
+        profile = dataset.profile
+        profile.update(
+            width=window.width,
+            height=window.height,
+            transform=dataset.window_transform(window))
+    with rasterio.io.MemoryFile() as memfile:
+        with memfile.open(**profile) as clipped:
+            clipped.write(data)
+        return memfile.read()
+
+
+def stream_file(workspace, layer, output, request=None):
+    """
+    Download a GeoTIFF published by GeoServer.
+
+    The whole file is sent with FileResponse, so the WSGI server can use
+    sendfile instead of copying it through Python. 'Range: bytes=...'
+    headers are answered with 206 partial content, which lets clients
+    resume interrupted downloads. With a 'bbox=minx,miny,maxx,maxy'
+    parameter (lon/lat) only the window of the raster inside the box is
+    read and returned as a new GeoTIFF.
+
+    Parameters:
+    -----------
+    - workspace : str
+        GeoServer workspace.
+    - layer : str
+        Layer name (folder and file name of the GeoTIFF).
+    - output : str
+        Name of the downloaded file.
+    - request : HttpRequest, optional
+        Request with the optional Range header and bbox parameter.
+
+    Returns:
+    --------
+    - HttpResponse
+        The file (200), a byte range of it (206) or an error response.
+    """
     file_path = f'{ENDPOINT}/{workspace}/{layer}/{layer}.geotiff'
+    bbox = request.GET.get('bbox') if request is not None else None
     try:
-        with rasterio.open(file_path) as dataset:
-            response = HttpResponse(
-                open(file_path, 'rb').read(), 
-                content_type='application/octet-stream')
+        size = os.path.getsize(file_path)
+        if bbox:
+            try:
+                bbox = [float(value) for value in bbox.split(',')]
+            except ValueError:
+                bbox = []
+            if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+                return HttpResponse('bbox must be minx,miny,maxx,maxy', status=400)
+            try:
+                response = HttpResponse(
+                    _clip_file(file_path, bbox),
+                    content_type='application/octet-stream')
+            except rasterio.errors.WindowError:
+                return HttpResponse('bbox does not intersect the raster', status=400)
             response['Content-Disposition'] = f'attachment; filename={output}'
             return response
+        #
+        header = request.META.get('HTTP_RANGE') if request is not None else None
+        byte_range = _parse_range(header, size)
+        if byte_range is False:
+            response = HttpResponse('Requested range not satisfiable', status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(
+                open(file_path, 'rb'),
+                as_attachment=True,
+                filename=output,
+                content_type='application/octet-stream')
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(file_path, start, end),
+                status=206,
+                content_type='application/octet-stream')
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Disposition'] = f'attachment; filename={output}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
     except FileNotFoundError:
         return HttpResponse('File not found', status=404)
     except Exception as e:
-        return HttpResponse(f'Error processing file: {e}', status=500) 
\ No newline at end of file
+        return HttpResponse(f'Error processing file: {e}', status=500)
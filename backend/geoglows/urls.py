@@ -1,6 +1,10 @@
 from django.urls import path
+from django.conf import settings
 from .views import *
 
+# Async variants of the I/O bound views when served by ASGI (config/asgi.py)
+ASYNC = settings.ASYNC_VIEWS
+
 urlpatterns = [
     path('daily-precipitation', 
           download_daily_precipitation, 
@@ -27,13 +31,17 @@ urlpatterns = [
           name="goes-hotspots"),
 
     path('download-layer', 
-          download_layer, 
+          download_layer_async if ASYNC else download_layer, 
           name="download-layer"),
 
     path('geoglows-flood-warnings', 
           get_geoglows_flood_warnings, 
           name="geoglows-flood-warnings"),
 
+    path('geoglows-flood-warnings/<int:z>/<int:x>/<int:y>.pbf', 
+          get_geoglows_flood_warnings_tile, 
+          name="geoglows-flood-warnings-tile"),
+
     path('geoglows-streamflow-warnings', 
           get_geoglows_streamflow_warnings, 
           name="geoglows-streamflow-warnings"),
@@ -47,11 +55,11 @@ urlpatterns = [
           name="historical-simulation-plot"),
 
     path('geoglows-data-plot', 
-          get_data_plot, 
+          get_data_plot_async if ASYNC else get_data_plot, 
           name="geoglows-data-plot"),
 
     path('geoglows-table', 
-          get_probability_table, 
+          get_probability_table_async if ASYNC else get_probability_table, 
           name="geoglows-table"),
 
     path('get-historical-simulation-csv', 
@@ -62,6 +70,22 @@ urlpatterns = [
           get_forecast_csv, 
           name="get-forecast-csv"),
 
+    path('geoglows-forecast-batch', 
+          get_forecast_batch, 
+          name="geoglows-forecast-batch"),
+
+    path('database-pool-status', 
+          get_database_pool_status, 
+          name="database-pool-status"),
+
+    path('historical-cache-status', 
+          get_historical_cache_status, 
+          name="historical-cache-status"),
+
+    path('metrics', 
+          get_metrics, 
+          name="metrics"),
+
     path('retrieve-daily-hydropower-report', 
           retrieve_daily_hydropower_report, 
           name="retrieve-daily-hydropower-report"),
@@ -1,34 +1,52 @@
-from django.http import JsonResponse, HttpResponse
+import datetime as dt
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, HttpResponseBadRequest
+from django.http import HttpResponseNotFound
 from .controllers.download import stream_file
 from .controllers.fireforest import get_heatpoints_24h, get_goes_hotspots
 from .controllers.geoglows import *
-from .controllers.reports import *
+from common.database import get_pool_stats, DATABASE_ERRORS
+from common.cache import historical_cache, forecast_cache
+from common.http_cache import cache_response
+from common.export import export_response
+from common.lazy import lazy_import
+from common.aio import run_blocking, async_database_errors
+from common.profiling import span, metrics_text
+
+# PDF reports (reportlab) are only loaded when one is requested
+reports = lazy_import("geoglows.controllers.reports")
 
 
 def download_daily_precipitation(request):
     response = stream_file(
-        "fireforest", "daily_precipitation", "daily-precipitation.tif")
+        "fireforest", "daily_precipitation", "daily-precipitation.tif", request)
     return response
 
 def download_days_without_precipitation(request):
     response = stream_file(
-        "fireforest", "no_precipitation_days", "days-without-precipitation.tif")
+        "fireforest", "no_precipitation_days", "days-without-precipitation.tif", request)
     return response
 
 def download_3days_precipitation(request):
     response = stream_file(
-        "fireforest", "3days_precipitation", "3days-precipitation.tif")
+        "fireforest", "3days_precipitation", "3days-precipitation.tif", request)
     return response
 
 def download_soil_moisture(request):
     response = stream_file(
-        "fireforest", "soil_moisture", "soil_moisture.tif")
+        "fireforest", "soil_moisture", "soil_moisture.tif", request)
     return response
 
 def download_layer(request):
     workspace = request.GET.get('workspace')
     layer = request.GET.get('layer')
-    response = stream_file(workspace, layer, f"{workspace}-{layer}.tif")
+    response = stream_file(workspace, layer, f"{workspace}-{layer}.tif", request)
+    return response
+
+async def download_layer_async(request):
+    workspace = request.GET.get('workspace')
+    layer = request.GET.get('layer')
+    response = await run_blocking(
+        stream_file, workspace, layer, f"{workspace}-{layer}.tif", request)
     return response
 
 def heatpoints_24h(request):
@@ -42,57 +60,145 @@ def goes_hotspots(request):
 
 ###
 
+@cache_response('date')
 def get_geoglows_flood_warnings(request):
     date = request.GET.get('date')
     data = get_flood_alerts(date)
-    return JsonResponse(data)
+    return StreamingHttpResponse(data, content_type='application/json')
 
+@cache_response('date')
 def get_geoglows_streamflow_warnings(request):
     date = request.GET.get('date')
     data = get_streamflow_alerts(date)
-    return JsonResponse(data)
+    return StreamingHttpResponse(data, content_type='application/json')
 
+@cache_response('date')
 def get_geoglows_waterlevel_warnings(request):
     date = request.GET.get('date')
     data = get_waterlevel_alerts(date)
-    return JsonResponse(data)
+    return StreamingHttpResponse(data, content_type='application/json')
+
+@cache_response('date')
+def get_geoglows_flood_warnings_tile(request, z, x, y):
+    date = request.GET.get('date')
+    tile = get_flood_alerts_tile(date, z, x, y)
+    return HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
 
 
 
 def get_historical_simulation_plot(request):
     comid = request.GET.get('comid')
     plot = historical_simulation_plot(comid)
-    return JsonResponse(plot)
+    with span("serialise"):
+        return JsonResponse(plot)
 
+@cache_response('comid', 'date', 'width')
 def get_data_plot(request):
     comid = request.GET.get('comid')
     date = request.GET.get('date')
     width = request.GET.get('width')
     plot = all_data_plot(comid, date, width)
-    return JsonResponse(plot)
+    with span("serialise"):
+        return JsonResponse(plot)
 
-def get_probability_table(request):
+@cache_response('comid', 'date', 'width')
+async def get_data_plot_async(request):
     comid = request.GET.get('comid')
     date = request.GET.get('date')
-    table = probability_table(comid, date)
+    width = request.GET.get('width')
+    plot = await all_data_plot_async(comid, date, width)
+    with span("serialise"):
+        return JsonResponse(plot)
+
+def _forecast_params(request):
+    # COMID and initialization date of a forecast, ValueError if not valid
+    comid = int(request.GET.get('comid', ''))
+    date = request.GET.get('date', '')
+    dt.datetime.fromisoformat(date)
+    return comid, date
+
+def _probability_table_response(table):
+    # Only a rendered table is a 200 (and cached by cache_response)
+    if table is None:
+        return HttpResponseNotFound("No forecast for this COMID and date")
     return HttpResponse(table)
 
+@cache_response('comid', 'date')
+def get_probability_table(request):
+    try:
+        comid, date = _forecast_params(request)
+    except ValueError:
+        return HttpResponseBadRequest("'comid' must be an integer and 'date' an ISO date")
+    try:
+        table = probability_table(comid, date)
+    except DATABASE_ERRORS:
+        return HttpResponse("Database not available", status=503)
+    return _probability_table_response(table)
+
+@cache_response('comid', 'date')
+async def get_probability_table_async(request):
+    try:
+        comid, date = _forecast_params(request)
+    except ValueError:
+        return HttpResponseBadRequest("'comid' must be an integer and 'date' an ISO date")
+    try:
+        table = await probability_table_async(comid, date)
+    except async_database_errors():
+        return HttpResponse("Database not available", status=503)
+    return _probability_table_response(table)
+
 def get_historical_simulation_csv(request):
     comid = request.GET.get('comid')
-    historical_simulation = historical_data_csv(comid)
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="historical_simulation_{comid}.csv"'
-    historical_simulation.to_csv(path_or_buf=response, index=True)
-    return response
+    fmt = request.GET.get('format', 'csv')
+    historical_simulation = historical_data_csv(comid, fmt)
+    return export_response(historical_simulation, fmt, f"historical_simulation_{comid}")
 
+@cache_response('comid', 'date', 'format')
 def get_forecast_csv(request):
     comid = request.GET.get('comid')
     date = request.GET.get('date')
-    forecast = forecast_csv(comid, date)
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="ensemble_forecast_{comid}.csv"'
-    forecast.to_csv(path_or_buf=response, index=True)
-    return response
+    fmt = request.GET.get('format', 'csv')
+    forecast = forecast_csv(comid, date, fmt)
+    return export_response(forecast, fmt, f"ensemble_forecast_{comid}")
+
+def get_forecast_batch(request):
+    try:
+        comids = [int(comid) for comid in request.GET.get('comids', '').split(',') if comid]
+    except ValueError:
+        return HttpResponseBadRequest("'comids' must be a comma separated list of COMIDs")
+    if len(comids) > BATCH_MAX_COMIDS:
+        return HttpResponseBadRequest(f"At most {BATCH_MAX_COMIDS} COMIDs per request")
+    try:
+        limit = int(request.GET.get('limit', BATCH_MAX_COMIDS))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= BATCH_MAX_COMIDS:
+        return HttpResponseBadRequest(f"'limit' must be an integer between 1 and {BATCH_MAX_COMIDS}")
+    date = request.GET.get('date')
+    start = request.GET.get('start')
+    end = request.GET.get('end')
+    data = forecast_batch(comids, date, start, end, limit)
+    return StreamingHttpResponse(data, content_type='application/x-ndjson')
+
+
+def get_database_pool_status(request):
+    return JsonResponse(get_pool_stats())
+
+
+def get_historical_cache_status(request):
+    return JsonResponse(historical_cache.stats())
+
+
+def get_metrics(request):
+    # Prometheus scrape endpoint: latency per view and span, pool and caches
+    gauges = {}
+    for name, value in get_pool_stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            gauges[f"geoglows_db_pool_{name}"] = (f"Connection pool: {name}.", value)
+    for cache_name, cache in (("historical", historical_cache), ("forecast", forecast_cache)):
+        for name, value in cache.stats().items():
+            gauges[f"geoglows_{cache_name}_cache_{name}"] = (f"{cache_name.capitalize()} cache: {name}.", value)
+    return HttpResponse(metrics_text(gauges), content_type='text/plain; version=0.0.4')
 
 
 def retrieve_daily_hydropower_report(request):
@@ -114,5 +220,5 @@ def retrieve_daily_hydropower_report(request):
         ],
     }
     df = pd.DataFrame(data)
-    pdf_report = report(df)
+    pdf_report = reports.report(df)
     return pdf_report
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import get_metdata
+from django.conf import settings
+from .views import get_metdata, get_metdata_async
 
 urlpatterns = [
-    path('get-metdata', get_metdata, name="login")
+    path('get-metdata', get_metdata_async if settings.ASYNC_VIEWS else get_metdata, name="login")
 ]
 
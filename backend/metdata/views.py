@@ -1,10 +1,12 @@
-import requests
-import rasterio
+from common.lazy import lazy_import
+requests = lazy_import("requests")
+rasterio = lazy_import("rasterio")
 import json
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from django.http import JsonResponse
-from rasterio.mask import mask
-import geopandas as gpd
+from common.aio import get_http_client, run_blocking
+gpd = lazy_import("geopandas")
 import numpy as np
 import pandas as pd
 
@@ -15,7 +17,7 @@ ENDPOINT = "/usr/share/geoserver/data_dir/data"
 def get_raster_value(gdf, raster):
     try:
         geometries = gdf.geometry.values
-        out_image, out_transform = mask(raster, geometries, crop=True)
+        out_image, out_transform = rasterio.mask.mask(raster, geometries, crop=True)
         out_image = out_image.astype(float)
         if raster.nodata is not None:
             out_image[out_image == raster.nodata] = np.nan
@@ -39,24 +41,27 @@ def fetch_raster_value(date, url, gdf):
     return {'date': date, 'value': value}
 
 
-def get_metdata(request):
-        layers = request.GET.get('layers')
-        dates = request.GET.get('dates')
-        code = request.GET.get('code')
-        
-        layers = json.loads(layers)
-        dates = json.loads(dates)
+def _area_url(code):
+    if code.endswith("00"):
+        return f"{GEOSERVER}/ecuador-limits/ows?service=WFS&version=1.0.0&request=GetFeature&typeName=ecuador-limits%3Aprovincias&maxFeatures=50&outputFormat=application%2Fjson&CQL_FILTER=DPA_CANTON={code}"
+    else:
+        return f"{GEOSERVER}/ecuador-limits/ows?service=WFS&version=1.0.0&request=GetFeature&typeName=ecuador-limits%3Acantones&maxFeatures=50&outputFormat=application%2Fjson&CQL_FILTER=DPA_CANTON={code}"
 
-        workspace = layers[0].split(':')[0]
-        layer_names = [layer.split(':')[1] for layer in layers]
-        urls = [f"{ENDPOINT}/{workspace}/{layer}/{layer}.geotiff" for layer in layer_names]
-        
-        if code.endswith("00"):
-            area_url = f"{GEOSERVER}/ecuador-limits/ows?service=WFS&version=1.0.0&request=GetFeature&typeName=ecuador-limits%3Aprovincias&maxFeatures=50&outputFormat=application%2Fjson&CQL_FILTER=DPA_CANTON={code}"
-        else:
-            area_url = f"{GEOSERVER}/ecuador-limits/ows?service=WFS&version=1.0.0&request=GetFeature&typeName=ecuador-limits%3Acantones&maxFeatures=50&outputFormat=application%2Fjson&CQL_FILTER=DPA_CANTON={code}"
+
+def _metdata_request(request):
+    layers = json.loads(request.GET.get('layers'))
+    dates = json.loads(request.GET.get('dates'))
+    code = request.GET.get('code')
+    workspace = layers[0].split(':')[0]
+    layer_names = [layer.split(':')[1] for layer in layers]
+    urls = [f"{ENDPOINT}/{workspace}/{layer}/{layer}.geotiff" for layer in layer_names]
+    return dates, urls, code
+
+
+def get_metdata(request):
+        dates, urls, code = _metdata_request(request)
         #
-        area = requests.get(area_url).json()
+        area = requests.get(_area_url(code)).json()
         gdf = gpd.GeoDataFrame.from_features(area["features"])
         # 
         with ThreadPoolExecutor(max_workers=10) as executor:
@@ -64,6 +69,19 @@ def get_metdata(request):
         #
         return JsonResponse(results, safe=False)
 
+
+async def get_metdata_async(request):
+    # ASGI version: the WFS call does not block the worker and the raster
+    # reads share the bounded executor of common.aio
+    dates, urls, code = _metdata_request(request)
+    #
+    area = await get_http_client().get(_area_url(code))
+    gdf = gpd.GeoDataFrame.from_features(area.json()["features"])
+    #
+    results = await asyncio.gather(*[
+        run_blocking(fetch_raster_value, date, url, gdf) for date, url in zip(dates, urls)])
+    return JsonResponse(results, safe=False)
+
         
 
 
@@ -1,10 +1,15 @@
 import os
+import sys
 import pandas as pd
 import sqlalchemy as sql
 import datetime as dt
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, MetaData, Table, select
 
+# Shared modules of the backend (stamp file of its historical cache)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from common.cache import touch_historical_stamp
+
 
 ###############################################################################
 #                        MODULES AND CUSTOM FUNCTIONS                         #
@@ -347,6 +352,7 @@ insert_data_table(table="streamflow_data", con=con, partitions=partitions_data,
 insert_simple_table(table="waterlevel_stations", con=con)
 insert_data_table(table="waterlevel_data", con=con, partitions=partitions_data, var='code')
 insert_data_table(table="historical_simulation", con=con, partitions=partitions_data, var="comid")
+touch_historical_stamp()
 
 # Query comids from drainage network
 drainage = pd.read_sql("select comid from drainage_network;", con)
@@ -182,6 +182,163 @@ CREATE TABLE IF NOT EXISTS historical_simulation_2020_2030
 CREATE INDEX idx_historical_simulation_comid_datetime 
     ON historical_simulation (comid, datetime);
 
+
+---------------------------------------------------------------------
+--             bias-corrected historical simulation                --
+---------------------------------------------------------------------
+-- Populated by update_corrected_simulation.py (one series per station)
+CREATE TABLE IF NOT EXISTS corrected_simulation_streamflow (
+    datetime TIMESTAMP NOT NULL,
+    code TEXT NOT NULL REFERENCES streamflow_stations(code),
+    value NUMERIC NOT NULL
+) PARTITION BY RANGE (datetime);
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_streamflow_1980_1990 
+    PARTITION OF corrected_simulation_streamflow
+    FOR VALUES FROM ('1980-01-01') TO ('1990-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_streamflow_1990_2000 
+    PARTITION OF corrected_simulation_streamflow
+    FOR VALUES FROM ('1990-01-01') TO ('2000-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_streamflow_2000_2010 
+    PARTITION OF corrected_simulation_streamflow
+    FOR VALUES FROM ('2000-01-01') TO ('2010-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_streamflow_2010_2020 
+    PARTITION OF corrected_simulation_streamflow
+    FOR VALUES FROM ('2010-01-01') TO ('2020-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_streamflow_2020_2030 
+    PARTITION OF corrected_simulation_streamflow
+    FOR VALUES FROM ('2020-01-01') TO ('2030-01-01');
+
+CREATE INDEX idx_corrected_simulation_streamflow_code_datetime 
+    ON corrected_simulation_streamflow (code, datetime);
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_waterlevel (
+    datetime TIMESTAMP NOT NULL,
+    code TEXT NOT NULL REFERENCES waterlevel_stations(code),
+    value NUMERIC NOT NULL
+) PARTITION BY RANGE (datetime);
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_waterlevel_1980_1990 
+    PARTITION OF corrected_simulation_waterlevel
+    FOR VALUES FROM ('1980-01-01') TO ('1990-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_waterlevel_1990_2000 
+    PARTITION OF corrected_simulation_waterlevel
+    FOR VALUES FROM ('1990-01-01') TO ('2000-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_waterlevel_2000_2010 
+    PARTITION OF corrected_simulation_waterlevel
+    FOR VALUES FROM ('2000-01-01') TO ('2010-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_waterlevel_2010_2020 
+    PARTITION OF corrected_simulation_waterlevel
+    FOR VALUES FROM ('2010-01-01') TO ('2020-01-01');
+
+CREATE TABLE IF NOT EXISTS corrected_simulation_waterlevel_2020_2030 
+    PARTITION OF corrected_simulation_waterlevel
+    FOR VALUES FROM ('2020-01-01') TO ('2030-01-01');
+
+CREATE INDEX idx_corrected_simulation_waterlevel_code_datetime 
+    ON corrected_simulation_waterlevel (code, datetime);
+
+---------------------------------------------------------------------
+--                      return periods tables                      --
+---------------------------------------------------------------------
+-- return_periods is populated by update_return_periods.py and the
+-- station tables by update_corrected_simulation.py
+CREATE TABLE IF NOT EXISTS return_periods (
+    comid INT NOT NULL PRIMARY KEY REFERENCES drainage_network(comid),
+    return_period_100 NUMERIC,
+    return_period_50 NUMERIC,
+    return_period_25 NUMERIC,
+    return_period_10 NUMERIC,
+    return_period_5 NUMERIC,
+    return_period_2 NUMERIC
+);
+
+CREATE TABLE IF NOT EXISTS return_periods_streamflow (
+    code TEXT NOT NULL PRIMARY KEY REFERENCES streamflow_stations(code),
+    comid INT NOT NULL REFERENCES drainage_network(comid),
+    return_period_100 NUMERIC,
+    return_period_50 NUMERIC,
+    return_period_25 NUMERIC,
+    return_period_10 NUMERIC,
+    return_period_5 NUMERIC,
+    return_period_2 NUMERIC
+);
+
+CREATE TABLE IF NOT EXISTS return_periods_waterlevel (
+    code TEXT NOT NULL PRIMARY KEY REFERENCES waterlevel_stations(code),
+    comid INT NOT NULL REFERENCES drainage_network(comid),
+    return_period_100 NUMERIC,
+    return_period_50 NUMERIC,
+    return_period_25 NUMERIC,
+    return_period_10 NUMERIC,
+    return_period_5 NUMERIC,
+    return_period_2 NUMERIC
+);
+
+---------------------------------------------------------------------
+--                 bias correction models per station              --
+---------------------------------------------------------------------
+-- Written by the validation apps (backend/common/bias_correction.py):
+-- monthly quantile mapping of a station and river reach, replaced when
+-- the observations or the simulation it was fitted on change
+CREATE TABLE IF NOT EXISTS bias_correction_models (
+    code TEXT NOT NULL,
+    comid INT NOT NULL REFERENCES drainage_network(comid),
+    variable TEXT NOT NULL,
+    method TEXT NOT NULL,
+    observed_count INT NOT NULL,
+    observed_until TIMESTAMP,
+    simulated_until TIMESTAMP,
+    model BYTEA NOT NULL,
+    updated TIMESTAMP NOT NULL,
+    PRIMARY KEY (code, comid, variable, method)
+);
+
+---------------------------------------------------------------------
+--                goodness of fit metrics per station              --
+---------------------------------------------------------------------
+-- Populated nightly by update_station_metrics.py (backend/common/metrics.py):
+-- metrics of the simulated and corrected series of a station for the full
+-- series, each month and each season, replaced when the data change
+CREATE TABLE IF NOT EXISTS station_metrics (
+    code TEXT NOT NULL,
+    comid INT NOT NULL REFERENCES drainage_network(comid),
+    variable TEXT NOT NULL,
+    method TEXT NOT NULL,
+    observed_count INT NOT NULL,
+    observed_until TIMESTAMP,
+    simulated_until TIMESTAMP,
+    metrics JSONB NOT NULL,
+    updated TIMESTAMP NOT NULL,
+    PRIMARY KEY (code, comid, variable, method)
+);
+
+---------------------------------------------------------------------
+--                historical simulation climatology                --
+---------------------------------------------------------------------
+-- Populated by update_climatology.py (one row of arrays per comid)
+CREATE TABLE IF NOT EXISTS historical_climatology (
+    comid INT NOT NULL PRIMARY KEY REFERENCES drainage_network(comid),
+    daily_min REAL[],
+    daily_p25 REAL[],
+    daily_p50 REAL[],
+    daily_p75 REAL[],
+    daily_max REAL[],
+    monthly_p25 REAL[],
+    monthly_p50 REAL[],
+    monthly_p75 REAL[],
+    volume_dates TIMESTAMP[],
+    volume_values REAL[],
+    fdc_flow REAL[]
+);
+
 ---------------------------------------------------------------------
 --                     ensemble forecast data                      --
 ---------------------------------------------------------------------
@@ -296,6 +453,20 @@ CREATE TABLE IF NOT EXISTS ensemble_forecast_2025_05
 CREATE INDEX idx_ensemble_forecast_comid_initialized
     ON ensemble_forecast (comid, initialized);
 
+---------------------------------------------------------------------
+--               exceedance probabilities of forecast              --
+---------------------------------------------------------------------
+-- Populated by update_ensemble_forecast.py: percentage of members above
+-- the 2, 5, 10, 25, 50 and 100 years return periods for each forecast
+-- day, stored day after day (6 values per day) starting at startdate
+CREATE TABLE IF NOT EXISTS forecast_probabilities (
+    comid INT NOT NULL REFERENCES drainage_network(comid),
+    initialized TIMESTAMP NOT NULL,
+    startdate TIMESTAMP NOT NULL,
+    probabilities SMALLINT[] NOT NULL,
+    PRIMARY KEY (comid, initialized)
+);
+
 ---------------------------------------------------------------------
 --                      forecast records data                      --
 ---------------------------------------------------------------------
@@ -1,4 +1,5 @@
 import os
+import sys
 import math
 import geoglows
 import numpy as np
@@ -11,6 +12,14 @@ from sqlalchemy import create_engine
 import warnings
 warnings.filterwarnings("ignore")
 
+# Shared modules of the backend (alert levels, return periods and stamp file
+# of the forecast cache)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from common.ensemble import exceedance_probabilities, get_alert_levels
+from common.ensemble import ALERT_RETURN_PERIOD_COLUMNS
+from common.cache import touch_forecast_stamp
+from common.return_periods import get_stored_return_periods
+
 
 ###############################################################################
 #                        MODULES AND CUSTOM FUNCTIONS                         #
@@ -20,8 +29,8 @@ def get_format_data(sql_statement, conn):
     Retrieve and format data from a database.
 
     This function executes an SQL query to retrieve data from a database,
-    sets the 'datetime' column as the index of the DataFrame, formats the index
-    to a specified datetime string format, and returns the formatted DataFrame.
+    sets the 'datetime' column as the index of the DataFrame and returns the
+    formatted DataFrame.
 
     Parameters:
     sql_statement (str): SQL query to execute.
@@ -38,11 +47,6 @@ def get_format_data(sql_statement, conn):
     #
     # Drop the 'datetime' column as it is now the index
     data = data.drop(columns=['datetime'])
-    #
-    # Format the index values to the desired datetime string format
-    data.index = pd.to_datetime(data.index)
-    data.index = data.index.to_series().dt.strftime("%Y-%m-%d %H:%M:%S")
-    data.index = pd.to_datetime(data.index)
     return(data)
 
 def get_bias_corrected_data(sim, obs):
@@ -247,8 +251,6 @@ def get_corrected_forecast(simulated_df, ensemble_df, observed_df):
     return(corrected_ensembles)
 
 
-
-
 def get_warnings(code, comid, date, con):
     """
     Retrieve and process hydrological data to generate warnings based on 
@@ -268,11 +270,10 @@ def get_warnings(code, comid, date, con):
     observed_data = get_format_data(sql, con)
     observed_data[observed_data < 0.1] = 0.1
     #
-    # Retrieve historical simulation and corrected data
+    # Retrieve historical simulation
     sql = f"SELECT datetime, value FROM historical_simulation WHERE comid={comid}"
     simulated_data = get_format_data(sql, con)
     simulated_data[simulated_data < 0.1] = 0.1
-    corrected_data = get_bias_corrected_data(simulated_data, observed_data)
     #
     # Retrieve ensemble forecast data
     sql = f"SELECT * FROM ensemble_forecast WHERE initialized='{date}' AND comid={comid}"
@@ -280,44 +281,24 @@ def get_warnings(code, comid, date, con):
     # Corrected forecast
     corrected_ensemble_forecast = get_corrected_forecast(simulated_data, ensemble_forecast, observed_data)
     max_ensemble_forecast = corrected_ensemble_forecast.resample('D').max()
-    return_periods = get_return_periods(comid, corrected_data)
     #
-    # Initialize a list to store results
-    results = []
+    # Corrected return periods (precomputed or fitted on the corrected data)
+    return_periods = get_stored_return_periods(
+        con, comid, code=code, table="return_periods_streamflow")
+    if return_periods is None:
+        corrected_data = get_bias_corrected_data(simulated_data, observed_data)
+        return_periods = get_return_periods(comid, corrected_data)
     #
-    # Threshold for triggering a warning
-    cond = 20
+    # Percentage of members exceeding each return period threshold per day
+    thresholds = return_periods[ALERT_RETURN_PERIOD_COLUMNS].to_numpy(dtype=float)[0]
+    probabilities = exceedance_probabilities(
+        max_ensemble_forecast.to_numpy(dtype=float), thresholds, members=52)
     #
-    # Iterate over each day in the resampled ensemble forecast
-    for i, dts in enumerate(max_ensemble_forecast.index):
-        # Count the number of ensemble members exceeding each return period threshold
-        r2 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_2'].values[0]).sum() * 100/52
-        r5 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_5'].values[0]).sum() * 100/52
-        r10 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_10'].values[0]).sum() * 100/52
-        r25 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_25'].values[0]).sum() * 100/52
-        r50 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_50'].values[0]).sum() * 100/52
-        r100 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_100'].values[0]).sum() * 100/52
-        #
-        # Determine the alert level based on the number of exceedances
-        alert = "R0"
-        if r2 >= cond:
-            alert = "R2"
-        if r5 >= cond:
-            alert = "R5"
-        if r10 >= cond:
-            alert = "R10"
-        if r25 >= cond:
-            alert = "R25"
-        if r50 >= cond:
-            alert = "R50"
-        if r100 >= cond:
-            alert = "R100"
-        #
-        # Append the result to the list
-        results.append({"alert": alert})
+    # Alert level of each day (threshold for triggering a warning: 20%)
+    alerts = get_alert_levels(probabilities, cond=20)
     #
-    # Convert the list of results to a DataFrame
-    out = pd.DataFrame(results)
+    # Convert the results to a DataFrame
+    out = pd.DataFrame({"alert": alerts})
     out = out.drop(out.index[-1]).T
     out["datetime"] = date
     out["code"] = code
@@ -346,11 +327,10 @@ def get_warnings_waterlevel(code, comid, date, con):
     observed_data = get_format_data(sql, con)
     observed_data[observed_data < 0.1] = 0.1
     #
-    # Retrieve historical simulation and corrected data
+    # Retrieve historical simulation
     sql = f"SELECT datetime, value FROM historical_simulation WHERE comid={comid}"
     simulated_data = get_format_data(sql, con)
     simulated_data[simulated_data < 0.1] = 0.1
-    corrected_data = get_bias_corrected_data(simulated_data, observed_data)
     #
     # Retrieve ensemble forecast data
     sql = f"SELECT * FROM ensemble_forecast WHERE initialized='{date}' AND comid={comid}"
@@ -358,44 +338,24 @@ def get_warnings_waterlevel(code, comid, date, con):
     # Corrected forecast
     corrected_ensemble_forecast = get_corrected_forecast(simulated_data, ensemble_forecast, observed_data)
     max_ensemble_forecast = corrected_ensemble_forecast.resample('D').max()
-    return_periods = get_return_periods(comid, corrected_data)
     #
-    # Initialize a list to store results
-    results = []
+    # Corrected return periods (precomputed or fitted on the corrected data)
+    return_periods = get_stored_return_periods(
+        con, comid, code=code, table="return_periods_waterlevel")
+    if return_periods is None:
+        corrected_data = get_bias_corrected_data(simulated_data, observed_data)
+        return_periods = get_return_periods(comid, corrected_data)
     #
-    # Threshold for triggering a warning
-    cond = 20
+    # Percentage of members exceeding each return period threshold per day
+    thresholds = return_periods[ALERT_RETURN_PERIOD_COLUMNS].to_numpy(dtype=float)[0]
+    probabilities = exceedance_probabilities(
+        max_ensemble_forecast.to_numpy(dtype=float), thresholds, members=52)
     #
-    # Iterate over each day in the resampled ensemble forecast
-    for i, dts in enumerate(max_ensemble_forecast.index):
-        # Count the number of ensemble members exceeding each return period threshold
-        r2 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_2'].values[0]).sum() * 100/52
-        r5 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_5'].values[0]).sum() * 100/52
-        r10 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_10'].values[0]).sum() * 100/52
-        r25 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_25'].values[0]).sum() * 100/52
-        r50 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_50'].values[0]).sum() * 100/52
-        r100 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_100'].values[0]).sum() * 100/52
-        #
-        # Determine the alert level based on the number of exceedances
-        alert = "R0"
-        if r2 >= cond:
-            alert = "R2"
-        if r5 >= cond:
-            alert = "R5"
-        if r10 >= cond:
-            alert = "R10"
-        if r25 >= cond:
-            alert = "R25"
-        if r50 >= cond:
-            alert = "R50"
-        if r100 >= cond:
-            alert = "R100"
-        #
-        # Append the result to the list
-        results.append({"alert": alert})
+    # Alert level of each day (threshold for triggering a warning: 20%)
+    alerts = get_alert_levels(probabilities, cond=20)
     #
-    # Convert the list of results to a DataFrame
-    out = pd.DataFrame(results)
+    # Convert the results to a DataFrame
+    out = pd.DataFrame({"alert": alerts})
     out = out.drop(out.index[-1]).T
     out["datetime"] = date
     out["code"] = code
@@ -405,6 +365,7 @@ def get_warnings_waterlevel(code, comid, date, con):
     return(out)
 
 
+
 ###############################################################################
 #                                MAIN ROUTINE                                 #
 ###############################################################################
@@ -479,3 +440,6 @@ for i in range(len(stations.code)):
 
 # Close the connection
 con.close()
+
+# Invalidate the forecast cache of the backend
+touch_forecast_stamp()
@@ -1,4 +1,5 @@
 import os
+import sys
 import math
 import numpy as np
 import pandas as pd
@@ -6,6 +7,16 @@ import sqlalchemy as sql
 import datetime as dt
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
+
+# Shared modules of the backend (alert levels, probabilities table, return
+# periods and stamp file of the forecast cache)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from common.ensemble import exceedance_probabilities, get_alert_levels
+from common.ensemble import ALERT_RETURN_PERIOD_COLUMNS
+from common.cache import touch_forecast_stamp
+from common.probabilities import probability_matrix
+from common.return_periods import get_stored_return_periods
 
 
 ###############################################################################
@@ -58,8 +69,8 @@ def get_format_data(sql_statement, conn):
     Retrieve and format data from a database.
 
     This function executes an SQL query to retrieve data from a database,
-    sets the 'datetime' column as the index of the DataFrame, formats the index
-    to a specified datetime string format, and returns the formatted DataFrame.
+    sets the 'datetime' column as the index of the DataFrame and returns the
+    formatted DataFrame.
 
     Parameters:
     sql_statement (str): SQL query to execute.
@@ -76,11 +87,6 @@ def get_format_data(sql_statement, conn):
     #
     # Drop the 'datetime' column as it is now the index
     data = data.drop(columns=['datetime'])
-    #
-    # Format the index values to the desired datetime string format
-    data.index = pd.to_datetime(data.index)
-    data.index = data.index.to_series().dt.strftime("%Y-%m-%d %H:%M:%S")
-    data.index = pd.to_datetime(data.index)
     return(data)
 
 
@@ -251,10 +257,50 @@ def get_ensemble_stats(ensemble: pd.DataFrame) -> pd.DataFrame:
 
 
 
+def store_probabilities(comid, date, ensemble_forecast, thresholds, con) -> None:
+    """
+    Store the day x return period matrix shown in the probabilities table
+    of the backend (/geoglows-table), as whole percentages, so the endpoint
+    only has to read one row. Nothing is stored for an empty forecast, and a
+    failed insert is rolled back (the backend computes the table itself),
+    so it never stops the alerts.
+
+    Parameters:
+    comid (int): The identifier for the river reach.
+    date (datetime): The initialization date of the ensemble forecast.
+    ensemble_forecast (pd.DataFrame): Ensemble forecast (time x member).
+    thresholds (np.ndarray): Return periods for 2, 5, 10, 25, 50 and 100 years.
+    con (sqlalchemy.engine.Connection): Database connection.
+    """
+    # Same matrix as the backend computes from the ensemble
+    stored = probability_matrix(ensemble_forecast, thresholds)
+    if stored is None:
+        print(f"Sin pronostico para las probabilidades de {comid}")
+        return
+    startdate, probabilities = stored
+    #
+    sql_insert = sql.text("""
+        INSERT INTO forecast_probabilities (comid, initialized, startdate, probabilities)
+        VALUES (:comid, :initialized, :startdate, :probabilities)
+        ON CONFLICT (comid, initialized) DO UPDATE
+        SET startdate = EXCLUDED.startdate, probabilities = EXCLUDED.probabilities""")
+    try:
+        con.execute(sql_insert, {
+            "comid": int(comid),
+            "initialized": date,
+            "startdate": startdate.to_pydatetime(),
+            "probabilities": probabilities.astype(int).ravel().tolist()})
+    except SQLAlchemyError as e:
+        # Includes ProgrammingError (table not created yet)
+        con.rollback()
+        print(f"No se pudo guardar las probabilidades de {comid}: {e}")
+
+
 def get_warnings(comid, date, con):
     """
     Retrieve and process hydrological data to generate warnings based on 
-    ensemble forecast exceedances of return period thresholds.
+    ensemble forecast exceedances of return period thresholds. The
+    probabilities table of the forecast is stored on the way.
 
     Parameters:
     - comid (int): The identifier for the river reach.
@@ -264,54 +310,32 @@ def get_warnings(comid, date, con):
     Returns:
     - None
     """
-    # Retrieve historical simulation data
-    sql = f"SELECT datetime, value FROM historical_simulation WHERE comid={comid}"
-    simulated_data = get_format_data(sql, con)
-    #
     # Retrieve ensemble forecast data
     sql = f"SELECT * FROM ensemble_forecast WHERE initialized='{date}' AND comid={comid}"
     ensemble_forecast = get_format_data(sql, con).drop(columns=['comid', "initialized"])
     max_ensemble_forecast = ensemble_forecast.resample('D').max()
     #
-    # Retrieve return periods data
-    return_periods = get_return_periods(comid, simulated_data)
+    # Retrieve return periods data (fitted on the historical simulation if
+    # they were not precomputed)
+    return_periods = get_stored_return_periods(con, comid)
+    if return_periods is None:
+        sql = f"SELECT datetime, value FROM historical_simulation WHERE comid={comid}"
+        simulated_data = get_format_data(sql, con)
+        return_periods = get_return_periods(comid, simulated_data)
     #
-    # Initialize a list to store results
-    results = []
+    # Percentage of members exceeding each return period threshold per day
+    thresholds = return_periods[ALERT_RETURN_PERIOD_COLUMNS].to_numpy(dtype=float)[0]
+    probabilities = exceedance_probabilities(
+        max_ensemble_forecast.to_numpy(dtype=float), thresholds, members=52)
     #
-    # Threshold for triggering a warning
-    cond = 20
+    # Matrix of the probabilities table, stored for the backend
+    store_probabilities(comid, date, ensemble_forecast, thresholds, con)
     #
-    # Iterate over each day in the resampled ensemble forecast
-    for i, dts in enumerate(max_ensemble_forecast.index):
-        # Count the number of ensemble members exceeding each return period threshold
-        r2 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_2'].values[0]).sum() * 100/52
-        r5 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_5'].values[0]).sum() * 100/52
-        r10 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_10'].values[0]).sum() * 100/52
-        r25 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_25'].values[0]).sum() * 100/52
-        r50 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_50'].values[0]).sum() * 100/52
-        r100 = (max_ensemble_forecast.iloc[i] > return_periods['return_period_100'].values[0]).sum() * 100/52
-        #
-        # Determine the alert level based on the number of exceedances
-        alert = "R0"
-        if r2 >= cond:
-            alert = "R2"
-        if r5 >= cond:
-            alert = "R5"
-        if r10 >= cond:
-            alert = "R10"
-        if r25 >= cond:
-            alert = "R25"
-        if r50 >= cond:
-            alert = "R50"
-        if r100 >= cond:
-            alert = "R100"
-        #
-        # Append the result to the list
-        results.append({"alert": alert})
+    # Alert level of each day (threshold for triggering a warning: 20%)
+    alerts = get_alert_levels(probabilities, cond=20)
     #
-    # Convert the list of results to a DataFrame
-    out = pd.DataFrame(results)
+    # Convert the results to a DataFrame
+    out = pd.DataFrame({"alert": alerts})
     out = out.drop(out.index[-1]).T
     out["datetime"] = date
     out["comid"] = comid
@@ -323,8 +347,6 @@ def get_warnings(comid, date, con):
 
 
 
-
-
 ###############################################################################
 #                                MAIN ROUTINE                                 #
 ###############################################################################
@@ -367,4 +389,7 @@ for comid in comids:
 # Close the connection
 con.close()
 
+# Invalidate the forecast cache of the backend
+touch_forecast_stamp()
+
 # Empieza 12:16 - 14:00
\ No newline at end of file
@@ -1,10 +1,15 @@
 import os
+import sys
 import pandas as pd
 import sqlalchemy as sql
 import datetime as dt
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 
+# Shared modules of the backend (stamp file of its forecast cache)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+from common.cache import touch_forecast_stamp
+
 
 ###############################################################################
 #                        MODULES AND CUSTOM FUNCTIONS                         #
@@ -91,4 +96,7 @@ for comid in comids:
 # Close the connection
 con.close()
 
+# Invalidate the forecast cache of the backend
+touch_forecast_stamp()
+
 # Empieza 12:14
\ No newline at end of file